@@ -21,11 +21,17 @@ import re
 import json
 import threading
 import queue
+import time
+import functools
+import hashlib
+import unicodedata
+from collections import Counter
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from openpyxl import Workbook
 import sys
 
+# openpyxl, subprocess and multiprocessing are imported on first use to keep startup fast
+
 CONFIG_FILE = 'vn_config.json'
 
 # Language dictionaries
@@ -72,7 +78,13 @@ All settings auto-save and restore on restart.""",
         'lbl_rules': 'Dialogue delimiter rules (top priority first):',
         'col_start': 'Start',
         'col_end': 'End',
+        'col_options': 'Options',
+        'chk_regex': 'Regex',
         'btn_convert': 'Convert',
+        'btn_cancel': 'Cancel',
+        'btn_reverse': 'From translated TXT',
+        'msg_reverse_original': 'No _backup.txt was found next to the TXT. Choose the original (untranslated) TXT?\n\n'
+                                'Without it, only segments that still have their ;m[] lines can be rebuilt.',
         'btn_add': 'Add Rule',
         'lbl_start': 'Start:',
         'lbl_end': 'End:',
@@ -80,12 +92,25 @@ All settings auto-save and restore on restart.""",
         'msg_no_files': 'Choose TXT and Excel files.',
         'msg_no_rules': 'Add at least one delimiter rule.',
         'msg_end_required': 'End delimiter is required!',
+        'msg_bad_regex': 'Invalid regular expression:',
         'msg_finished': 'Export completed.',
         'msg_error': 'Error',
         'lbl_stats': 'Statistics:',
         'lbl_total_lines': 'Total lines:',
         'lbl_dialogue_segments': 'Dialogue segments:',
-        'lbl_progress': 'Progress:'
+        'lbl_progress': 'Progress:',
+        'lbl_shard_by': 'Split by:',
+        'lbl_shard_size': 'Size:',
+        'lbl_shard_target': 'Into:',
+        'lbl_mt_backend': 'MT pre-fill:',
+        'lbl_mt_location': 'Glossary / URL:',
+        'msg_mt_identity': 'The identity backend copies the Japanese Dialogue into Translate. Fill Translate with it anyway?',
+        'profile_menu': 'Profile',
+        'profile_new': 'New profile…',
+        'profile_delete': 'Delete this profile',
+        'msg_profile_name': 'Name of the new profile (it starts as a copy of the current one):',
+        'msg_profile_delete': 'Delete the profile',
+        'msg_profile_last': 'The last profile cannot be deleted.'
     },
     'vi': {
         'title': 'Tsumamigui 3 Tool',
@@ -129,7 +154,13 @@ Tất cả các cài đặt tự động lưu và khôi phục lại khi khởi
         'lbl_rules': 'Quy tắc phân định hội thoại (ưu tiên từ trên xuống):',
         'col_start': 'Bắt đầu',
         'col_end': 'Kết thúc',
+        'col_options': 'Tùy chọn',
+        'chk_regex': 'Regex',
         'btn_convert': 'Chuyển đổi',
+        'btn_cancel': 'Hủy',
+        'btn_reverse': 'Từ TXT đã dịch',
+        'msg_reverse_original': 'Không tìm thấy _backup.txt cạnh tệp TXT. Chọn tệp TXT gốc (chưa dịch)?\n\n'
+                                'Nếu không, chỉ các đoạn còn dòng ;m[] mới được dựng lại.',
         'btn_add': 'Thêm quy tắc',
         'lbl_start': 'Bắt đầu:',
         'lbl_end': 'Kết thúc:',
@@ -137,60 +168,271 @@ Tất cả các cài đặt tự động lưu và khôi phục lại khi khởi
         'msg_no_files': 'Hãy chọn tệp TXT và Excel.',
         'msg_no_rules': 'Thêm ít nhất một quy tắc phân định.',
         'msg_end_required': 'Ký tự kết thúc là bắt buộc!',
+        'msg_bad_regex': 'Biểu thức chính quy không hợp lệ:',
         'msg_finished': 'Xuất hoàn tất.',
         'msg_error': 'Lỗi',
         'lbl_stats': 'Thống kê:',
         'lbl_total_lines': 'Tổng số dòng:',
         'lbl_dialogue_segments': 'Đoạn hội thoại:',
-        'lbl_progress': 'Tiến độ:'
+        'lbl_progress': 'Tiến độ:',
+        'lbl_shard_by': 'Chia theo:',
+        'lbl_shard_size': 'Kích thước:',
+        'lbl_shard_target': 'Thành:',
+        'lbl_mt_backend': 'Dịch máy điền trước:',
+        'lbl_mt_location': 'Từ điển / URL:',
+        'msg_mt_identity': 'Chế độ identity chép nguyên văn tiếng Nhật vào cột Translate. Vẫn điền như vậy?',
+        'profile_menu': 'Hồ sơ',
+        'profile_new': 'Hồ sơ mới…',
+        'profile_delete': 'Xóa hồ sơ này',
+        'msg_profile_name': 'Tên hồ sơ mới (bắt đầu là bản sao của hồ sơ hiện tại):',
+        'msg_profile_delete': 'Xóa hồ sơ',
+        'msg_profile_last': 'Không thể xóa hồ sơ cuối cùng.'
     }
 }
 
 re_m = re.compile(r'^;m\[(\d+)]\s*=\s*"(.*)"')
+re_m_any = re.compile(r'^(;?)m\[(\d+)]\s*=\s*"(.*)"')  # Commented original or uncommented translation
+re_m_translated = re.compile(r'^m\[(\d+)]\s*=\s*"(.*)"')
+re_unescape = re.compile(r'\\(["\\])')
 re_s = re.compile(r'^;s\[(\d+)]\s*=\s*"(.*)"')
 re_has_letter = re.compile(r'\D')
 
+# Commented original line as bytes, for splicing translations into the raw TXT
+re_m_bytes = re.compile(rb'^;m\[(\d+)][ \t]*=[ \t]*".*"[^\r\n]*', re.M)
+# Only lines starting with these are decoded; every other line is passed through as bytes
+PARSED_PREFIXES = (b';m[', b';s[', b'm[')
+
 def speaker_finder(line: str):
     m = re_s.match(line)
     if m and re_has_letter.search(m.group(2)):
         return m.group(2)
     return None
 
-def parse_stream(txt_path: str, rules: list[dict], q_msg: queue.Queue):
-    file_size = os.path.getsize(txt_path)
-    read_bytes = 0
-    recent_speakers = []  # List to store recent s[] entries
 
-    with open(txt_path, encoding='utf-8', errors='ignore') as fh:
-        buf, cur_rule = [], None
-        start_tag, start_line, line_idx = None, None, -1
+class DecodeErrors:
+    """Undecodable byte runs met while reading a TXT, by byte offset"""
 
-        def find_matching_rule(text):
-            """Find the best matching rule for given text, prioritizing non-empty start rules"""
-            # First pass: check rules with non-empty start
-            for r in rules:
-                if r['start'] != '' and text.startswith(r['start']):
-                    return r
-            
-            # Second pass: check rules with empty start
-            for r in rules:
-                if r['start'] == '':
-                    return r
-            
-            # Fallback: create a rule based on last character
-            return {'start': '', 'end': text[-1:]}
+    MAX_OFFSETS = 20  # Offsets kept for the report
 
-        def should_start_new_segment(text, current_rule):
-            """Check if we should start a new segment for this text"""
-            if not buf:
-                return True
-            
-            # Check if this text matches a rule with explicit start delimiter
-            for r in rules:
-                if r['start'] != '' and text.startswith(r['start']):
-                    return True
-            
-            return False
+    def __init__(self):
+        self.count = 0
+        self.offsets = []
+
+    def add(self, offset, length):
+        self.count += length
+        if len(self.offsets) < self.MAX_OFFSETS:
+            self.offsets.append(offset)
+
+    def summary(self):
+        if not self.count:
+            return ''
+        shown = ', '.join(map(str, self.offsets[:5])) + (', …' if len(self.offsets) > 5 else '')
+        return f'{self.count} undecodable bytes in the TXT (byte offsets {shown})'
+
+
+def decode_bytes(data, offset=0, errors=None):
+    """Decode UTF-8 bytes (or a memoryview); bad bytes become U+FFFD and are recorded in errors"""
+    try:
+        return str(data, 'utf-8')
+    except UnicodeDecodeError:
+        pass
+    data = bytes(data)
+    parts, pos = [], 0
+    while True:
+        try:
+            parts.append(data[pos:].decode('utf-8'))
+            return '\ufffd'.join(parts)
+        except UnicodeDecodeError as exc:
+            parts.append(data[pos:pos + exc.start].decode('utf-8'))
+            if errors is not None:
+                errors.add(offset + pos + exc.start, exc.end - exc.start)
+            pos += exc.end
+
+
+def iter_txt_lines(data, prefixes=PARSED_PREFIXES, errors=None):
+    """Yield (offset, text) for the lines of a TXT buffer that start with one of the byte prefixes.
+
+    Only those lines are decoded; the line ending is not part of the text.
+    """
+    view = memoryview(data)
+    pos, size = 0, len(data)
+    while pos < size:
+        end = data.find(b'\n', pos)
+        end = size if end < 0 else end + 1
+        if data.startswith(prefixes, pos):
+            yield pos, decode_bytes(view[pos:end], pos, errors).rstrip('\r\n')
+        pos = end
+
+
+def splice_translations(data, translations, progress=None):
+    """Replace the ;m[N] lines that have a translation, leaving every other byte as it was.
+
+    Returns (chunks, replaced): memoryview slices of data interleaved with the
+    encoded m[N] lines, ready for ``writelines``. Line endings are kept.
+    """
+    view = memoryview(data)
+    chunks, last, replaced = [], 0, 0
+    for m in re_m_bytes.finditer(data):
+        m_num = int(m.group(1))
+        if m_num in translations:
+            chunks.append(view[last:m.start()])
+            chunks.append(f'm[{m_num}] = "{translations[m_num]}"'.encode('utf-8'))
+            last = m.end()
+            replaced += 1
+            if progress and replaced % 4096 == 0:
+                progress(last / len(data))
+    chunks.append(view[last:])
+    return chunks, replaced
+
+RULE_OPTION_KEYS = ('regex', 'speaker', 'exclude')
+
+
+# Leading global inline flags of a regex rule, e.g. (?i)
+re_global_flags = re.compile(r'\(\?([aiLmsux]+)\)')
+# Escapes in a pattern; group 1 is a numbered backreference, group 2 a numbered conditional
+re_numbered_backref = re.compile(r'\\(?:([1-9])|.)|\(\?\((\d+)\)', re.S)
+
+
+class RuleSet:
+    """Prioritized delimiter rules compiled into combined regex automata.
+
+    Besides the plain ``start``/``end`` pair a rule may carry:
+    - ``regex``: treat ``start`` and ``end`` as regular expressions
+    - ``speaker``: regex the current speaker must match for the rule to apply
+    - ``exclude``: lines whose text matches ``start`` are system text and skipped
+
+    All start patterns of the rules that apply to a speaker are joined into
+    alternations with one named group per rule, bucketed by first character,
+    so a line is matched with one ``re.match`` call no matter how many rules
+    there are. Compiled automata are cached per distinct set of applicable
+    rules.
+    """
+
+    def __init__(self, rules: list[dict]):
+        self.rules = [dict(r) for r in rules]
+        self._ends = []
+        self._speakers = []
+        for r in self.rules:
+            self._ends.append(re.compile(f"(?:{self._pattern(r, 'end')})\\Z"))
+            self._speakers.append(re.compile(r['speaker']) if r.get('speaker') else None)
+            if r.get('regex') and r.get('start'):
+                # Group numbers shift once the start is joined with other rules
+                for m in re_numbered_backref.finditer(r['start']):
+                    if m.group(1) or m.group(2):
+                        raise re.error('numbered backreferences are not supported in start patterns, '
+                                       'use (?P<name>...) and (?P=name)', r['start'], m.start())
+        self._by_speaker = {}
+        self._automata = {}
+        # Compile the automaton of every rule up front so bad rules fail before parsing
+        self._automaton(tuple(range(len(self.rules))))
+
+    @staticmethod
+    def _pattern(rule, key):
+        value = rule.get(key, '')
+        if not rule.get('regex'):
+            return re.escape(value)
+        # Global flags are only allowed at the very start, so scope them to this rule
+        m = re_global_flags.match(value)
+        if not m:
+            return value
+        # A verbose-mode comment would swallow the closing parenthesis on the same line
+        return f"(?{m.group(1)}:{value[m.end():]}{chr(10) if 'x' in m.group(1) else ''})"
+
+    def _applicable(self, speaker):
+        idx = self._by_speaker.get(speaker)
+        if idx is None:
+            idx = tuple(i for i, cond in enumerate(self._speakers)
+                        if cond is None or (speaker and cond.search(speaker)))
+            self._by_speaker[speaker] = idx
+        return idx
+
+    @staticmethod
+    def _dispatch(branches):
+        """Compile (first_char, pattern) branches into a first-character jump table.
+
+        Literal starts only land in the bucket of their first character, while
+        regex starts (first_char None) are kept in every bucket in priority
+        order, so each line only tries the alternatives that can match it.
+        """
+        if not branches:
+            return {}, None
+        wildcard = [p for c, p in branches if c is None]
+        table = {}
+        for c in {c for c, _ in branches if c is not None}:
+            table[c] = re.compile('|'.join(p for bc, p in branches if bc is None or bc == c))
+        return table, re.compile('|'.join(wildcard)) if wildcard else None
+
+    def _automaton(self, idx):
+        auto = self._automata.get(idx)
+        if auto is not None:
+            return auto
+
+        starts, excludes, fallback = [], [], None
+        for i in idx:
+            r = self.rules[i]
+            first = None if r.get('regex') else r.get('start', '')[:1]
+            if r.get('exclude'):
+                if r.get('start'):
+                    excludes.append((first, f"(?:{self._pattern(r, 'start')})"))
+            elif r.get('start'):
+                starts.append((first, f"(?P<r{i}>{self._pattern(r, 'start')})"))
+            elif fallback is None:
+                fallback = i
+
+        auto = (self._dispatch(starts), self._dispatch(excludes), fallback)
+        self._automata[idx] = auto
+        return auto
+
+    @staticmethod
+    def _match(dispatch, text):
+        table, default = dispatch
+        pattern = table.get(text[:1], default)
+        return pattern.match(text) if pattern is not None else None
+
+    def match_start(self, text, speaker=''):
+        """Return the index of the highest-priority rule whose start matches, or None"""
+        m = self._match(self._automaton(self._applicable(speaker))[0], text)
+        return int(m.lastgroup[1:]) if m else None
+
+    def is_excluded(self, text, speaker=''):
+        return self._match(self._automaton(self._applicable(speaker))[1], text) is not None
+
+    def find_end(self, text, speaker=''):
+        """Return the end matcher of the rule that opens a segment with this text"""
+        idx = self.match_start(text, speaker)
+        if idx is None:
+            idx = self._automaton(self._applicable(speaker))[2]
+        if idx is not None:
+            return self._ends[idx]
+        # Fallback: create a rule based on last character
+        return re.compile(f"{re.escape(text[-1:])}\\Z")
+
+
+def compile_rules(rules) -> RuleSet:
+    return rules if isinstance(rules, RuleSet) else RuleSet(rules)
+
+
+def parse_stream(txt_path: str, rules, q_msg: queue.Queue, resume=None, checkpoint=None, translations=None,
+                 errors=None):
+    """Yield (range, speaker, dialogue) segments of the TXT dump.
+
+    ``resume`` is a previous checkpoint state ({'offset', 'speakers'}) to
+    continue from. ``checkpoint(offset, speakers)`` is called between
+    segments, where the byte offset and pending speakers fully describe the
+    parser state; it may raise JobCancelled to stop parsing. When a
+    ``translations`` dict is given, uncommented ``m[N] = "..."`` lines are
+    collected into it in the same pass. Only ``;m[``, ``;s[`` and ``m[`` lines
+    are decoded; undecodable bytes in them are recorded in ``errors``.
+    """
+    file_size = os.path.getsize(txt_path)
+    read_bytes = resume['offset'] if resume else 0
+    recent_speakers = list(resume['speakers']) if resume else []  # List to store recent s[] entries
+    ruleset = compile_rules(rules)
+
+    with open(txt_path, 'rb') as fh:
+        fh.seek(read_bytes)
+        buf, cur_end = [], None
+        start_tag, start_line, line_idx = None, None, -1
 
         def get_speaker_for_segment():
             """Get the first speaker with letters from recent_speakers list"""
@@ -199,106 +441,1206 @@ def parse_stream(txt_path: str, rules: list[dict], q_msg: queue.Queue):
                     return speaker
             return ''
 
+        def make_segment():
+            rng = f"{start_tag}" if len(buf) == 1 else f"{start_tag}-{buf[-1][0]}"
+            return rng, get_speaker_for_segment(), ''.join(t for _, t in buf)
+
         while True:
-            line = fh.readline()
-            if not line:
+            if checkpoint is not None and not buf:
+                checkpoint(read_bytes, recent_speakers)
+
+            raw = fh.readline()
+            if not raw:
                 # Flush remaining buffer at end of file
                 if buf:
-                    rng = f"{start_tag}" if len(buf) == 1 else f"{start_tag}-{buf[-1][0]}"
-                    spk = get_speaker_for_segment()
-                    yield rng, spk, ''.join(t for _, t in buf)
+                    yield make_segment()
                 break
 
             line_idx += 1
-            read_bytes += len(line)
+            read_bytes += len(raw)
+            if (read_bytes & ((1 << 20) - 1)) < len(raw):
+                q_msg.put(('progress', read_bytes / file_size))
+            if not raw.startswith(PARSED_PREFIXES):
+                continue
+            line = decode_bytes(raw, read_bytes - len(raw), errors)
 
             spk_tmp = speaker_finder(line)
             if spk_tmp is not None:
                 # If we encounter s[] line while having buffered m[] lines, flush the buffer
                 if buf:
-                    rng = f"{start_tag}" if len(buf) == 1 else f"{start_tag}-{buf[-1][0]}"
-                    spk = get_speaker_for_segment()
-                    yield rng, spk, ''.join(t for _, t in buf)
+                    yield make_segment()
                     buf.clear()
-                    cur_rule = None
+                    cur_end = None
                     start_tag = None
                     recent_speakers.clear()  # Clear speakers after flushing
-                
+
                 # Add speaker to recent list
                 recent_speakers.append(spk_tmp)
                 continue
 
             m = re_m.match(line)
             if not m:
+                if translations is not None:
+                    t = re_m_translated.match(line)
+                    if t:
+                        translations[int(t.group(1))] = t.group(2)
                 continue
 
             tag_num, m_text = int(m.group(1)), m.group(2)
+            speaker = get_speaker_for_segment()
 
-            # Check if we should start a new segment
-            if should_start_new_segment(m_text, cur_rule):
+            # System text closes the current segment and is never exported
+            if ruleset.is_excluded(m_text, speaker):
+                if buf:
+                    yield make_segment()
+                    buf.clear()
+                    cur_end = None
+                    start_tag = None
+                    recent_speakers.clear()
+                continue
+
+            # Start a new segment when idle or when the text opens an explicit start delimiter
+            if not buf or ruleset.match_start(m_text, speaker) is not None:
                 # Flush current buffer if exists
                 if buf:
-                    rng = f"{start_tag}" if len(buf) == 1 else f"{start_tag}-{buf[-1][0]}"
-                    spk = get_speaker_for_segment()
-                    yield rng, spk, ''.join(t for _, t in buf)
+                    yield make_segment()
                     buf.clear()
-                
+
                 # Start new segment
                 start_tag, start_line = tag_num, line_idx
-                cur_rule = find_matching_rule(m_text)
+                cur_end = ruleset.find_end(m_text, speaker)
 
             buf.append((tag_num, m_text))
 
             # Check if current dialogue segment is complete
-            if cur_rule and m_text.endswith(cur_rule['end']):
-                rng = f"{start_tag}" if len(buf) == 1 else f"{start_tag}-{buf[-1][0]}"
-                spk = get_speaker_for_segment()
-                yield rng, spk, ''.join(t for _, t in buf)
+            if cur_end and cur_end.search(m_text):
+                yield make_segment()
                 buf.clear()
-                cur_rule = None
+                cur_end = None
                 start_tag = None
                 recent_speakers.clear()  # Clear speakers after completing segment
 
-            if (read_bytes & ((1 << 20) - 1)) < len(line):
-                q_msg.put(('progress', read_bytes / file_size))
 
+# Rows per task sent to the insert process pool; smaller inputs run inline
+TRANSFORM_BATCH_SIZE = 2000
+
+
+@functools.lru_cache(maxsize=8)
+def build_char_table(vir_chars, phy_chars):
+    """str.translate table for the virtual → physical mapping (first mapping wins)"""
+    table = {}
+    for vir, phy in zip(vir_chars, phy_chars):
+        table.setdefault(ord(vir), phy)
+    return table
+
+
+def apply_char_replacement(text, vir_chars, phy_chars):
+    """Replace virtual characters with physical characters"""
+    if len(vir_chars) != len(phy_chars):
+        return text
+    return text.translate(build_char_table(vir_chars, phy_chars))
+
+
+@functools.lru_cache(maxsize=8)
+def build_inverse_char_table(vir_chars, phy_chars):
+    """str.translate table for the physical → virtual de-mapping.
+
+    Also returns the physical characters shared by several virtual ones;
+    those de-map to the first virtual character and may be wrong.
+    """
+    table, shared = {}, set()
+    for vir, phy in zip(vir_chars, phy_chars):
+        if table.setdefault(ord(phy), vir) != vir:
+            shared.add(phy)
+    return table, frozenset(shared)
+
+
+def split_text_by_chars(text, max_chars):
+    """Split text by max characters, avoiding breaking words and \\-escapes"""
+    if len(text) <= max_chars:
+        return [text]
+
+    max_chars = max(max_chars, 1)
+    result = []
+    pos = 0
+    while len(text) - pos > max_chars:
+        chunk = text[pos:pos + max_chars]
+        # Break after the last space or Japanese punctuation, else hard-cut the chunk
+        break_point = max(chunk.rfind(c) for c in ' 　、。！？') + 1 or len(chunk)
+        # Text is already escaped: an odd run of trailing backslashes would split \" or \\ across lines
+        if (break_point - len(chunk[:break_point].rstrip('\\'))) % 2 and break_point > 1:
+            break_point -= 1
+        result.append(chunk[:break_point])
+        pos += break_point
+
+    if pos < len(text):
+        result.append(text[pos:])
+
+    return result
+
+
+def parse_range(range_str):
+    """Expand a Range cell ("1069" or "1069-1072") into its m[] numbers"""
+    if '-' in range_str:
+        start_num, end_num = range_str.split('-')[:2]
+        return list(range(int(start_num), int(end_num) + 1))
+    return [int(range_str)]
+
+
+UNICODE_FORMS = ('NFC', 'NFKC', 'NFD', 'none')
+QUOTE_POLICIES = ('escape', 'fold', 'reject')
+# (unicode_form, fold_punctuation, join_lines, quotes)
+NORMALIZE_DEFAULTS = ('NFC', True, True, 'escape')
+
+# Typographic punctuation pasted from word processors, folded to what the game text expects
+PUNCTUATION_FOLDS = {
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u2033': '"',
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u2032': "'",
+    '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u00a0': ' ', '\t': ' ',
+    '\u200b': None, '\u200c': None, '\u200d': None, '\ufeff': None,
+}
 
-def save_config(txt_path, out_path, rules, insert_config=None):
-    config = {
-        'txt_path': txt_path,
-        'out_path': out_path,
-        'rules': rules
+# Applied before wrapping so escapes count toward max_chars; the splitter never breaks inside one
+QUOTE_TABLES = {
+    'escape': str.maketrans({'\\': '\\\\', '"': '\\"'}),
+    'fold': str.maketrans({'\\': '/', '"': "'"}),
+}
+
+re_control = re.compile(r'[\x00-\x1f\x7f]')
+re_line_breaks = re.compile(r'\s*[\r\n]+\s*')
+
+
+class InvalidRow(ValueError):
+    """A translation that cannot be written into the TXT without corrupting it"""
+
+
+@functools.lru_cache(maxsize=8)
+def build_normalizer(norm):
+    """Compile the normalization options into one function applied to every row"""
+    unicode_form, fold_punctuation, join_lines, _ = norm
+    table = str.maketrans(PUNCTUATION_FOLDS) if fold_punctuation else None
+
+    def normalize(text):
+        if unicode_form != 'none':
+            text = unicodedata.normalize(unicode_form, text)
+        if table:
+            text = text.translate(table)
+        if join_lines:
+            text = re_line_breaks.sub(' ', text)
+        return text.strip()
+
+    return normalize
+
+
+ALLOCATION_STRATEGIES = ('fill', 'balanced', 'sentence')
+
+# A sentence with its closing punctuation and trailing quotes; Latin sentences also end at a space
+re_sentence = re.compile(r'.*?(?:[。！？]+(?:\\?[」』）)"])*|[.!?…]+(?:\\?["\'」』）)])*(?:\s+|$))|.+')
+re_word_breaks = re.compile('[ 　、。！？]')
+
+
+def allocate_lines(text, slots, max_chars, strategy):
+    """Spread one translation over the m[] slots of its range.
+
+    ``fill`` wraps at max_chars and leaves the tail slots blank; ``balanced``
+    narrows the wrap width until the text just fits the slots so lines are
+    even; ``sentence`` starts every sentence on a new slot. Both fall back to
+    ``fill`` when their layout needs more lines than the range has. The
+    result may be longer than ``slots``; the caller drops the overflow.
+    """
+    lines = split_text_by_chars(text, max_chars)
+    if not slots or len(lines) > slots or strategy == 'fill':
+        return lines
+
+    if strategy == 'balanced':
+        # Greedy wrapping never needs more lines at a wider width, so bisect the narrowest that fits;
+        # never narrower than the longest word so balancing does not hard-cut what fill keeps whole
+        longest_word = max(map(len, re_word_breaks.split(text))) + 1
+        low, high = max(-(-len(text) // slots), min(longest_word, max_chars), 1), max_chars
+        while low < high:
+            width = (low + high) // 2
+            if len(split_text_by_chars(text, width)) <= slots:
+                high = width
+            else:
+                low = width + 1
+        return split_text_by_chars(text, low) if low < max_chars else lines
+
+    if strategy == 'sentence':
+        paged = [line for sentence in re_sentence.findall(text) for line in split_text_by_chars(sentence, max_chars)]
+        return paged if len(paged) <= slots else lines
+
+    raise ValueError(f'unknown allocation strategy: {strategy}')
+
+
+def wrap_translation(translate_text, settings, slots=None):
+    """Normalize, map and wrap one translation into its m[] line texts.
+
+    ``settings`` is the picklable ``(max_chars, vir_chars, phy_chars, norm,
+    allocation)`` tuple (``norm`` as in NORMALIZE_DEFAULTS, ``allocation``
+    one of ALLOCATION_STRATEGIES) so the same function runs inline or inside
+    a worker process. ``slots`` is the number of m[] lines of the range;
+    without it the text is simply filled. Raises InvalidRow for text that
+    would break the ``m[N] = "..."`` line.
+    """
+    max_chars, vir_chars, phy_chars, norm, allocation = settings
+    text = build_normalizer(norm)(translate_text)
+    bad = re_control.search(text)
+    if bad:
+        raise InvalidRow(f'control character U+{ord(bad.group()):04X} (line break?)')
+    quotes = norm[3]
+    if quotes == 'reject' and ('"' in text or '\\' in text):
+        raise InvalidRow('contains " or \\')
+
+    processed_text = apply_char_replacement(text, vir_chars, phy_chars)
+    # Quotes are escaped before wrapping so max_chars counts the characters actually written
+    if quotes in QUOTE_TABLES:
+        processed_text = processed_text.translate(QUOTE_TABLES[quotes])
+    return allocate_lines(processed_text, slots, max_chars, allocation)
+
+
+def allocate_row(range_str, translate_text, settings):
+    """(m_numbers, line texts) of one workbook row; the texts may outnumber the slots"""
+    m_numbers = parse_range(range_str)
+
+    # "null" uncomments every line of the range but leaves it empty
+    if translate_text.lower() == "null":
+        return m_numbers, []
+    return m_numbers, wrap_translation(translate_text, settings, len(m_numbers))
+
+
+def slot_pairs(m_numbers, split_texts):
+    """(m_num, text) pairs of a range; remaining m[] numbers are set to empty string"""
+    return [(m_num, split_texts[i] if i < len(split_texts) else "") for i, m_num in enumerate(m_numbers)]
+
+
+def transform_row(range_str, translate_text, settings):
+    """Turn one workbook row into (m_num, text) pairs for the line rewrite"""
+    return slot_pairs(*allocate_row(range_str, translate_text, settings))
+
+
+def allocation_record(range_str, m_numbers, split_texts):
+    """(range, slots, lines, widest line, overflowing chars) of one allocated row"""
+    slots = len(m_numbers)
+    return (range_str, slots, len(split_texts), max(map(len, split_texts), default=0),
+            sum(map(len, split_texts[slots:])))
+
+
+def transform_batch(batch, settings):
+    """Transform a batch of rows.
+
+    Returns (per-row pairs, [(range, reason)] of invalid rows, allocation
+    records of the translated rows).
+    """
+    results, errors, allocations = [], [], []
+    for range_str, text in batch:
+        try:
+            m_numbers, split_texts = allocate_row(range_str, text, settings)
+        except InvalidRow as exc:
+            results.append([])
+            errors.append((range_str, str(exc)))
+            continue
+        results.append(slot_pairs(m_numbers, split_texts))
+        if split_texts:
+            allocations.append(allocation_record(range_str, m_numbers, split_texts))
+    return results, errors, allocations
+
+
+def format_allocation_report(allocations):
+    """Tab-separated per-row allocation report, one line per translated row"""
+    lines = ['Range\tSlots\tLines\tWidest\tOverflow chars\n']
+    lines.extend('\t'.join(map(str, record)) + '\n' for record in allocations)
+    return lines
+
+
+def iter_transform_batches(rows, settings, workers=None):
+    """Yield (batch, batch_result) for TRANSFORM_BATCH_SIZE slices of rows, in order.
+
+    Batches are mapped over a process pool; ``Executor.map`` keeps batch
+    order. Closing the generator early cancels the batches not yet started.
+    """
+    batches = [rows[i:i + TRANSFORM_BATCH_SIZE] for i in range(0, len(rows), TRANSFORM_BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+
+    if len(batches) <= 1 or workers <= 1:
+        for batch in batches:
+            yield batch, transform_batch(batch, settings)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(batches)))
+    try:
+        yield from zip(batches, executor.map(transform_batch, batches, [settings] * len(batches)))
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job worker once the user has cancelled the job"""
+
+
+def file_signature(path):
+    """JSON-friendly identity of a file's current content (path, size, mtime)"""
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime]
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over path, so readers never see half a file"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Job:
+    """Cancellable background job with an optional on-disk checkpoint.
+
+    The checkpoint is a small JSON file next to the job's output. It records
+    a ``key`` describing the inputs (file signatures and settings), and is
+    only offered for resuming while the key still matches.
+    """
+
+    CHECKPOINT_INTERVAL = 2.0  # Seconds between periodic checkpoints
+
+    def __init__(self, name, checkpoint_path=None, key=None):
+        self.name = name
+        self.checkpoint_path = checkpoint_path
+        # Round-trip through JSON so tuples compare equal to the lists read back from disk
+        self.key = json.loads(json.dumps(key))
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self._last_save = time.monotonic()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def checkpoint_due(self):
+        """True when a checkpoint should be written now (interval elapsed or cancel pending)"""
+        return self.cancelled or time.monotonic() - self._last_save >= self.CHECKPOINT_INTERVAL
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data.get('state') if data.get('key') == self.key else None
+
+    def save_checkpoint(self, state):
+        if self.checkpoint_path:
+            write_json_atomic(self.checkpoint_path, {'job': self.name, 'key': self.key, 'state': state})
+        self._last_save = time.monotonic()
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+# File statistics keyed on path, reused while size and mtime are unchanged
+_file_stats_cache = {}
+_file_stats_lock = threading.Lock()
+
+
+def cached_file_stats(path):
+    """Return cached statistics for path, or None if missing or stale"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _file_stats_lock:
+        entry = _file_stats_cache.get(path)
+    if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+        return entry
+    return None
+
+
+def compute_file_stats(path):
+    """Count lines of path in binary chunks and cache the result by size and mtime"""
+    cached = cached_file_stats(path)
+    if cached:
+        return cached
+
+    st = os.stat(path)
+    total_lines, last = 0, b''
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            total_lines += chunk.count(b'\n')
+            last = chunk
+    if last and not last.endswith(b'\n'):
+        total_lines += 1  # Last line without a trailing newline
+
+    entry = {'size': st.st_size, 'mtime': st.st_mtime, 'total_lines': total_lines}
+    with _file_stats_lock:
+        _file_stats_cache[path] = entry
+    return entry
+
+
+WORKBOOK_HEADER = ['Range', 'Speaker', 'Dialogue', 'Translate']
+SHARD_MODES = ('none', 'segments', 'speaker')
+SHARD_TARGETS = ('sheets', 'workbooks')
+MANIFEST_SHEET = 'Shards'
+
+
+def shard_segments(segments, mode='none', size=5000):
+    """Group (range, speaker, dialogue[, translate]) segments into (label, segments) shards.
+
+    ``segments`` cuts every ``size`` segments, ``speaker`` gives each speaker
+    its own shard; script order is kept inside every shard.
+    """
+    if mode == 'segments':
+        size = max(int(size), 1)
+        return [(f'{i // size + 1:03d}', segments[i:i + size]) for i in range(0, len(segments), size)]
+    if mode == 'speaker':
+        groups = {}
+        for segment in segments:
+            groups.setdefault(segment[1] or '-', []).append(segment)
+        return [(f'{n:03d} {speaker}', rows) for n, (speaker, rows) in enumerate(groups.items(), 1)]
+    return [('Dialogues', segments)]
+
+
+def sheet_title(label, used):
+    """Excel-safe, unique sheet title (max 31 chars, no []:*?/\\)"""
+    base = re.sub(r'[\[\]:*?/\\]', '_', label)[:31]
+    title, n = base, 1
+    while title in used:
+        n += 1
+        title = f'{base[:27]}~{n}'
+    used.add(title)
+    return title
+
+
+def workbook_row(segment):
+    """Worksheet row for a (range, speaker, dialogue[, translate]) segment"""
+    return list(segment) + [''] * (len(WORKBOOK_HEADER) - len(segment))
+
+
+def write_shard_workbook(xlsx_path, title, segments):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(WORKBOOK_HEADER)
+    for segment in segments:
+        ws.append(workbook_row(segment))
+    wb.save(xlsx_path)
+    return len(segments)
+
+
+def export_segments(out_path, segments, shard_by='none', shard_size=5000, shard_target='sheets', workers=None):
+    """Write segments to out_path, optionally sharded into sheets or separate workbooks.
+
+    With ``shard_target='workbooks'`` each shard is saved as
+    ``<name>_<label>.xlsx`` by a process pool and out_path becomes a manifest
+    workbook whose 'Shards' sheet lists them, so insert can find every shard.
+    Returns the list of (file, label, segment count).
+    """
+    from openpyxl import Workbook
+
+    shards = shard_segments(segments, shard_by, shard_size)
+
+    if shard_by == 'none' or shard_target != 'workbooks':
+        wb = Workbook(write_only=True)
+        used = set()
+        for label, rows in shards:
+            ws = wb.create_sheet(sheet_title(label, used))
+            ws.append(WORKBOOK_HEADER)
+            for segment in rows:
+                ws.append(workbook_row(segment))
+        wb.save(out_path)
+        return [(os.path.basename(out_path), label, len(rows)) for label, rows in shards]
+
+    stem = os.path.splitext(os.path.basename(out_path))[0]
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    used = set()
+    jobs = []
+    for label, rows in shards:
+        safe_label = re.sub(r'[<>:"/\\|?*]', '_', label)
+        jobs.append((f'{stem}_{safe_label}.xlsx', sheet_title(label, used), rows))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(write_shard_workbook,
+                              [os.path.join(out_dir, f) for f, _, _ in jobs],
+                              [t for _, t, _ in jobs], [r for _, _, r in jobs]))
+    else:
+        for file_name, title, rows in jobs:
+            write_shard_workbook(os.path.join(out_dir, file_name), title, rows)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(MANIFEST_SHEET)
+    ws.append(['File', 'Label', 'Segments'])
+    for (file_name, _, rows), (label, _) in zip(jobs, shards):
+        ws.append([file_name, label, len(rows)])
+    wb.save(out_path)
+    return [(file_name, label, len(rows)) for (file_name, _, rows), (label, _) in zip(jobs, shards)]
+
+
+def is_range_header(row):
+    return bool(row) and str(row[0] or '').strip().lower() == 'range'
+
+
+def dialogue_sheets(wb, file_label):
+    """Worksheets holding (Range, Speaker, Dialogue, Translate) rows, and warnings about the sheets left out.
+
+    Sheets whose A1 is the Range header are read; when none has it (e.g. a
+    renamed header) the active sheet is read whatever its header says.
+    """
+    headers = [(ws, next(ws.iter_rows(max_row=1, values_only=True), None)) for ws in wb.worksheets]
+    sheets = [ws for ws, header in headers if is_range_header(header)]
+    if not sheets:
+        return [wb.active], [f'{file_label}: no sheet has the Range header, read the active sheet '
+                             f'"{wb.active.title}"']
+    return sheets, [f'{file_label}: sheet "{ws.title}" skipped, A1 is not "Range"'
+                    for ws, header in headers if ws not in sheets and header]
+
+
+def load_sheet_rows(xlsx_path):
+    """Read the dialogue sheets of one workbook; returns ([(sheet label, rows)], warnings)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path, read_only=True)
+    try:
+        file_label = os.path.basename(xlsx_path)
+        sheets, warnings = dialogue_sheets(wb, file_label)
+        parts = []
+        for ws in sheets:
+            it = ws.iter_rows(values_only=True)
+            next(it, None)  # Header
+            parts.append((f'{file_label} / {ws.title}',
+                          [tuple(row[:4]) + (None,) * (4 - len(row)) for row in it]))
+    finally:
+        wb.close()
+    return parts, warnings
+
+
+def workbook_sources(xlsx_path):
+    """List the workbooks holding the rows: the shards of a manifest, or the workbook itself"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path, read_only=True)
+    try:
+        if MANIFEST_SHEET not in wb.sheetnames:
+            return [xlsx_path]
+        base_dir = os.path.dirname(os.path.abspath(xlsx_path))
+        return [os.path.join(base_dir, row[0])
+                for row in wb[MANIFEST_SHEET].iter_rows(min_row=2, values_only=True) if row and row[0]]
+    finally:
+        wb.close()
+
+
+def load_workbook_rows(xlsx_path, workers=None, warnings=None):
+    """Read the rows of a workbook or of all its shard workbooks, concurrently and in order.
+
+    Sheets of a single workbook are read in one pass: every process would
+    otherwise re-parse the whole file. Skipped sheets and sheets repeating
+    ranges of an earlier one are reported in ``warnings`` when a list is
+    given.
+    """
+    sources = workbook_sources(xlsx_path)
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    if workers <= 1:
+        results = [load_sheet_rows(path) for path in sources]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(load_sheet_rows, sources))
+
+    rows, seen = [], set()
+    for parts, sheet_warnings in results:
+        if warnings is not None:
+            warnings.extend(sheet_warnings)
+        for label, sheet_rows in parts:
+            ranges = {str(row[0]) for row in sheet_rows if row[0]}
+            repeated = len(ranges & seen)
+            if repeated and warnings is not None:
+                warnings.append(f'{label}: {repeated} ranges repeat rows of an earlier sheet, the later rows win')
+            seen |= ranges
+            rows.extend(sheet_rows)
+    return rows
+
+
+def write_translations(xlsx_path, translations):
+    """Write {range: text} into the empty Translate cells of a workbook or its shards, in place.
+
+    Only those cells change: other columns, sheets, formatting and the
+    shard layout are kept. Each workbook is saved through a temp file.
+    Returns the number of cells written.
+    """
+    from openpyxl import load_workbook
+
+    written = 0
+    for path in workbook_sources(xlsx_path):
+        wb = load_workbook(path)
+        sheets, _ = dialogue_sheets(wb, os.path.basename(path))
+        changed = 0
+        for ws in sheets:
+            header = [str(cell.value or '').strip().lower() for cell in ws[1]]
+            column = header.index('translate') if 'translate' in header else WORKBOOK_HEADER.index('Translate')
+            for row in ws.iter_rows(min_row=2):
+                rng = row[0].value
+                if rng is None or str(rng) not in translations:
+                    continue
+                cell = row[column] if column < len(row) else ws.cell(row=row[0].row, column=column + 1)
+                if cell.value is None or not str(cell.value).strip():
+                    cell.value = translations[str(rng)]
+                    changed += 1
+        if changed:
+            tmp_path = f'{path}.tmp.xlsx'
+            wb.save(tmp_path)
+            os.replace(tmp_path, path)
+        wb.close()
+        written += changed
+    return written
+
+
+SEARCH_FIELDS = ('any', 'dialogue', 'translate')
+SEARCH_LIMIT = 500
+
+INDEX_VERSION = 2  # PRAGMA user_version of the index file; older files are rebuilt
+STATS_REGION_SIZE = 1000  # Script regions are blocks of this many m[] numbers
+STATS_GROUPS = ('speaker', 'region')
+STATS_REVISIONS = 10  # Revisions shown in the progress dashboard
+STATS_COLUMNS = ('Group', 'Segments', 'Translated', 'Null', 'Empty', 'Done', 'Source chars',
+                 'Translated chars', 'Lines used', 'Overflow')
+
+# Row states for the statistics
+STATE_EMPTY, STATE_NULL, STATE_TRANSLATED = 0, 1, 2
+
+SEARCH_SCHEMA = """
+CREATE TABLE segments (
+    id INTEGER PRIMARY KEY,
+    rng TEXT NOT NULL UNIQUE,
+    speaker TEXT NOT NULL,
+    dialogue TEXT NOT NULL,
+    translate TEXT NOT NULL,
+    region INTEGER NOT NULL,
+    slots INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    tr_chars INTEGER NOT NULL,
+    lines INTEGER NOT NULL
+);
+CREATE INDEX segments_speaker ON segments(speaker);
+"""
+
+# Running aggregates per (speaker, region), kept current from row deltas by a trigger.
+# lines counts used m[] slots (capped at the segment's slots); overflow counts segments
+# whose wrapped translation needs more lines than the segment has.
+STATS_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE stats (
+    speaker TEXT NOT NULL,
+    region INTEGER NOT NULL,
+    segments INTEGER NOT NULL,
+    translated INTEGER NOT NULL,
+    nulls INTEGER NOT NULL,
+    empty INTEGER NOT NULL,
+    source_chars INTEGER NOT NULL,
+    translated_chars INTEGER NOT NULL,
+    slots INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    overflow INTEGER NOT NULL,
+    PRIMARY KEY (speaker, region)
+);
+CREATE TABLE revisions (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    changed INTEGER NOT NULL,
+    translated INTEGER NOT NULL,
+    nulls INTEGER NOT NULL,
+    empty INTEGER NOT NULL
+);
+INSERT INTO stats
+    SELECT speaker, region, count(*), sum(state = 2), sum(state = 1), sum(state = 0), sum(length(dialogue)),
+           sum(tr_chars), sum(slots), sum(min(lines, slots)), sum(lines > slots)
+    FROM segments GROUP BY speaker, region;
+CREATE TRIGGER segments_stats AFTER UPDATE OF state, tr_chars, lines ON segments BEGIN
+    UPDATE stats SET
+        translated = translated + (new.state = 2) - (old.state = 2),
+        nulls = nulls + (new.state = 1) - (old.state = 1),
+        empty = empty + (new.state = 0) - (old.state = 0),
+        translated_chars = translated_chars + new.tr_chars - old.tr_chars,
+        lines = lines + min(new.lines, new.slots) - min(old.lines, old.slots),
+        overflow = overflow + (new.lines > new.slots) - (old.lines > old.slots)
+    WHERE speaker = new.speaker AND region = new.region;
+END;
+"""
+
+# Trigram FTS5 over an external-content table; triggers keep it in sync with translation updates
+SEARCH_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE segments_fts USING fts5(
+    dialogue, translate, content='segments', content_rowid='id', tokenize='trigram'
+);
+INSERT INTO segments_fts(segments_fts) VALUES ('rebuild');
+CREATE TRIGGER segments_au AFTER UPDATE OF translate ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, dialogue, translate)
+        VALUES ('delete', old.id, old.dialogue, old.translate);
+    INSERT INTO segments_fts(rowid, dialogue, translate) VALUES (new.id, new.dialogue, new.translate);
+END;
+"""
+
+
+def search_index_path(xlsx_path):
+    return f'{xlsx_path}.index.sqlite'
+
+
+@functools.lru_cache(maxsize=1)
+def fts_trigram_available():
+    """The trigram tokenizer needs SQLite 3.34+ built with FTS5"""
+    import sqlite3
+
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def row_stats(translate_text, slots, settings):
+    """(state, translated chars, wrapped lines) of one Translate cell.
+
+    Lines are only counted when the insert settings are known; rows that
+    normalization rejects use no lines.
+    """
+    if not translate_text:
+        return STATE_EMPTY, 0, 0
+    if translate_text.lower() == 'null':
+        return STATE_NULL, 0, 0
+    lines = 0
+    if settings:
+        try:
+            lines = len(wrap_translation(translate_text, settings, slots))
+        except InvalidRow:
+            pass
+    return STATE_TRANSLATED, len(translate_text), lines
+
+
+def record_revision(conn, changed):
+    conn.execute('INSERT INTO revisions (time, changed, translated, nulls, empty) '
+                 'SELECT ?, ?, total(translated), total(nulls), total(empty) FROM stats', (time.time(), changed))
+
+
+def build_search_index(xlsx_path, rows, settings=None):
+    """(Re)build the search index and statistics of a workbook from (Range, Speaker, Dialogue, Translate) rows.
+
+    ``settings`` are the insert settings used to measure the wrap budget.
+    """
+    import sqlite3
+
+    index_path = search_index_path(xlsx_path)
+    tmp_path = f'{index_path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SEARCH_SCHEMA)
+        # ids follow script order (shards may be grouped by speaker), so every query can
+        # walk the rows in id order and stop at the limit
+        rows = sorted((row for row in rows if row[0]), key=lambda row: parse_range(str(row[0]))[0])
+
+        def segment_values():
+            for rng, spk, txt, tr in rows:
+                m_numbers = parse_range(str(rng))
+                tr = str(tr or '').strip()
+                yield ((str(rng), spk or '', str(txt or ''), tr, m_numbers[0] // STATS_REGION_SIZE, len(m_numbers))
+                       + row_stats(tr, len(m_numbers), settings))
+
+        conn.executemany('INSERT OR REPLACE INTO segments (rng, speaker, dialogue, translate, region, slots, '
+                         'state, tr_chars, lines) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', segment_values())
+        # Bulk load first, then build the full-text index and the aggregates in one pass each
+        if fts_trigram_available():
+            conn.executescript(SEARCH_FTS_SCHEMA)
+        conn.executescript(STATS_SCHEMA)
+        conn.execute("INSERT INTO meta VALUES ('settings', ?)", (json.dumps(settings),))
+        record_revision(conn, len(rows))
+        conn.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+
+
+def open_search_index(xlsx_path):
+    """Connection to the workbook's search index, or None if it has not been built"""
+    import sqlite3
+
+    index_path = search_index_path(xlsx_path)
+    if not os.path.exists(index_path):
+        return None
+    conn = sqlite3.connect(index_path, check_same_thread=False)
+    if conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+        conn.close()
+        return None
+    return conn
+
+
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'segments_fts'").fetchone() is not None
+
+
+def update_search_index(conn, rows, settings=None):
+    """Apply (Range, Translate) rows to an open index; returns the number of changed segments.
+
+    Only rows whose translation changed are re-measured and written; the
+    triggers turn each of those row deltas into full-text and aggregate
+    updates. New insert settings re-measure the wrap budget of every
+    translated row.
+    """
+    current = dict(conn.execute('SELECT rng, translate FROM segments'))
+    changed = {rng: tr for rng, tr in rows if rng in current and current[rng] != tr}
+
+    stored = json.loads(conn.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()[0])
+    if settings and json.loads(json.dumps(settings)) != stored:
+        # Rows about to change are measured below with the new settings anyway
+        translated = [row for row in conn.execute('SELECT rng, translate, slots FROM segments WHERE state = ?',
+                                                  (STATE_TRANSLATED,)) if row[0] not in changed]
+        conn.executemany('UPDATE segments SET lines = ? WHERE rng = ?',
+                         ((row_stats(tr, n, settings)[2], rng) for rng, tr, n in translated))
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'settings'", (json.dumps(settings),))
+
+    conn.executemany('UPDATE segments SET translate = ?, state = ?, tr_chars = ?, lines = ? WHERE rng = ?',
+                     ((tr,) + row_stats(tr, len(parse_range(rng)), settings) + (rng,) for rng, tr in changed.items()))
+
+    if changed:
+        record_revision(conn, len(changed))
+    conn.commit()
+    return len(changed)
+
+
+def refresh_search_index(xlsx_path, rows, settings=None):
+    """Bring the index in line with the workbook rows after an insert, building it if missing or outdated"""
+    conn = open_search_index(xlsx_path)
+    if conn is None:
+        build_search_index(xlsx_path, rows, settings)
+        return
+    try:
+        update_search_index(conn, [(str(row[0]), str(row[3]).strip() if row[3] is not None else '')
+                                   for row in rows if row[0]], settings)
+    finally:
+        conn.close()
+
+
+def stats_summary(conn, group='speaker'):
+    """Aggregated statistics grouped by 'speaker' or 'region', plus the project total"""
+    sums = ('sum(segments), sum(translated), sum(nulls), sum(empty), sum(source_chars), '
+            'sum(translated_chars), sum(slots), sum(lines), sum(overflow)')
+    rows = conn.execute(f'SELECT {group}, {sums} FROM stats GROUP BY {group} ORDER BY {group}').fetchall()
+    total = conn.execute(f'SELECT {sums} FROM stats').fetchone()
+    return rows, total
+
+
+def stats_revisions(conn, limit=STATS_REVISIONS):
+    """Latest (time, changed, translated, nulls, empty) revisions, newest first"""
+    return conn.execute('SELECT time, changed, translated, nulls, empty FROM revisions '
+                        'ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+
+
+def format_stats_row(label, values):
+    """Dashboard columns for one aggregate row"""
+    segments, translated, nulls, empty, source_chars, translated_chars, slots, lines, overflow = values
+    done = (translated + nulls) / segments if segments else 0
+    return (label, segments, translated, nulls, empty, f'{done:.1%}', source_chars, translated_chars,
+            f'{lines}/{slots}', overflow)
+
+
+def region_label(region):
+    return f'm {region * STATS_REGION_SIZE}-{(region + 1) * STATS_REGION_SIZE - 1}'
+
+
+def search_speakers(conn):
+    return [row[0] for row in conn.execute('SELECT DISTINCT speaker FROM segments ORDER BY speaker')]
+
+
+def search_segments(conn, text='', speaker='', field='any', untranslated=False, limit=SEARCH_LIMIT):
+    """Query the index; returns (Range, Speaker, Dialogue, Translate) rows in script order.
+
+    Text of 3+ characters goes through the trigram index; shorter text
+    (e.g. a single 『) is a substring scan of the rows left by the other
+    filters, which stops as soon as ``limit`` rows are found.
+    """
+    columns = ('dialogue', 'translate') if field == 'any' else (field,)
+    sql = 'SELECT s.rng, s.speaker, s.dialogue, s.translate FROM segments s'
+    where, params = [], []
+    order = 's.id'
+    if text and len(text) >= 3 and has_fts(conn):
+        # FTS5 yields rowids in ascending order, so the join stops early at the limit
+        target = '{dialogue translate}' if field == 'any' else field
+        sql = ('SELECT s.rng, s.speaker, s.dialogue, s.translate FROM segments_fts f '
+               'JOIN segments s ON s.id = f.rowid')
+        where.append('segments_fts MATCH ?')
+        params.append(f'{target}: "' + text.replace('"', '""') + '"')
+        order = 'f.rowid'
+    elif text:
+        where.append('(' + ' OR '.join(f'instr(s.{c}, ?) > 0' for c in columns) + ')')
+        params.extend([text] * len(columns))
+    if speaker:
+        where.append('s.speaker = ?')
+        params.append(speaker)
+    if untranslated:
+        where.append("s.translate = ''")
+
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {order} LIMIT ?'
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+def is_native_glyph(char):
+    """True if the Japanese game font can render the character without a mapping slot"""
+    try:
+        char.encode('cp932')
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+def analyze_glyph_coverage(texts, vir_chars, phy_chars):
+    """Count characters of all translations and audit the virtual → physical mapping.
+
+    All cells are joined and counted with one Counter pass. Returns a dict with
+    the frequencies of mapped characters, characters the font lacks that have no
+    mapping (``unmapped``), mapped characters that never occur (``unused``),
+    physical slots shared by several characters and a compact ``proposal``:
+    used characters keep their slot, colliding and unmapped characters get the
+    slots freed by unused ones, and ``free_slots`` lists what is left over.
+    """
+    joined = ''.join(str(t).strip() for t in texts
+                     if t is not None and str(t).strip().lower() not in ('', 'null'))
+    # vir_chars are precomposed, so decomposed (NFD) input is counted as its NFC form
+    counts = Counter(unicodedata.normalize('NFC', joined))
+
+    mapping = {}
+    for vir, phy in zip(vir_chars, phy_chars):
+        mapping.setdefault(vir, phy)
+
+    used = sorted((c for c in mapping if counts[c]), key=lambda c: -counts[c])
+    unused = [c for c in mapping if not counts[c]]
+    unmapped = sorted((c for c in counts if c not in mapping and not is_native_glyph(c)),
+                      key=lambda c: -counts[c])
+
+    slot_users = {}
+    for vir, phy in mapping.items():
+        slot_users.setdefault(phy, []).append(vir)
+    shared_slots = {phy: virs for phy, virs in slot_users.items() if len(virs) > 1}
+
+    # Most frequent characters claim their current slot first; the rest are reassigned
+    proposal, taken, needs_slot = {}, set(), []
+    for char in used:
+        if mapping[char] in taken:
+            needs_slot.append(char)
+        else:
+            proposal[char] = mapping[char]
+            taken.add(mapping[char])
+    needs_slot.extend(unmapped)
+
+    free_slots = [phy for phy in dict.fromkeys(phy_chars) if phy not in taken]
+    for char in list(needs_slot):
+        if not free_slots:
+            break
+        proposal[char] = free_slots.pop(0)
+        needs_slot.remove(char)
+
+    return {
+        'total_chars': sum(counts.values()),
+        'distinct_chars': len(counts),
+        'mapping_active': len(vir_chars) == len(phy_chars),
+        'frequencies': {c: counts[c] for c in used},
+        'unmapped': {c: counts[c] for c in unmapped},
+        'unused': unused,
+        'shared_slots': shared_slots,
+        'proposal_vir': ''.join(proposal),
+        'proposal_phy': ''.join(proposal.values()),
+        'free_slots': free_slots,
+        'shortfall': needs_slot,
     }
+
+
+def format_glyph_report(report):
+    lines = [
+        f"Characters: {report['total_chars']} ({report['distinct_chars']} distinct)",
+        f"Mapped characters in use: {len(report['frequencies'])}",
+    ]
+    if not report['mapping_active']:
+        lines.append('WARNING: Virtual and Physical lengths differ, mapping is currently disabled')
+    if report['frequencies']:
+        lines.append('  ' + ' '.join(f'{c}:{n}' for c, n in report['frequencies'].items()))
+    lines.append(f"Unmapped characters missing from the font: {len(report['unmapped'])}")
+    if report['unmapped']:
+        lines.append('  ' + ' '.join(f'{c}:{n}' for c, n in report['unmapped'].items()))
+    lines.append(f"Unused mapped characters (wasted slots): {len(report['unused'])}")
+    if report['unused']:
+        lines.append('  ' + ''.join(report['unused']))
+    for phy, virs in report['shared_slots'].items():
+        lines.append(f"Slot {phy} is shared by: {''.join(virs)}")
+    lines += [
+        '',
+        f"Proposed mapping ({len(report['proposal_vir'])} slots, {len(report['free_slots'])} freed):",
+        f"  Virtual:  {report['proposal_vir']}",
+        f"  Physical: {report['proposal_phy']}",
+    ]
+    if report['free_slots']:
+        lines.append(f"  Free slots: {''.join(report['free_slots'])}")
+    if report['shortfall']:
+        lines.append(f"  Not enough slots for: {''.join(report['shortfall'])}")
+    return '\n'.join(lines)
+
+
+CONFIG_SAVE_DELAY = 0.5  # Seconds of quiet after the last change before vn_config.json is written
+DEFAULT_PROFILE = 'default'
+
+
+class ConfigStore:
+    """vn_config.json held in memory, with named profiles and debounced atomic writes.
+
+    The file holds ``{"active_profile": name, "profiles": {name: settings}}``;
+    a flat file from older versions becomes the ``default`` profile. Every
+    update changes one top-level key or section of the active profile in
+    memory; the whole file is written through write_json_atomic by a timer
+    thread CONFIG_SAVE_DELAY seconds after the last change, so bursts of UI
+    changes cost one write and the Tk thread never waits on disk. The timer
+    is not a daemon thread: a pending write still finishes when the app
+    exits.
+    """
+
+    def __init__(self, path=CONFIG_FILE, delay=CONFIG_SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._data = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._version = 0  # Bumped by every change
+        self._saved_version = 0
+
+    def _load(self):
+        if self._data is None:
+            data = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            if 'profiles' not in data:
+                data = {'active_profile': DEFAULT_PROFILE, 'profiles': {DEFAULT_PROFILE: data}} if data else \
+                    {'active_profile': DEFAULT_PROFILE, 'profiles': {}}
+            self._data = data
+        return self._data
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._load().get('active_profile', DEFAULT_PROFILE)
+
+    def profiles(self):
+        with self._lock:
+            return sorted(set(self._load()['profiles']) | {self.active})
+
+    def _profile(self):
+        return self._load()['profiles'].setdefault(self.active, {})
+
+    def get(self):
+        """Deep copy of the active profile's settings"""
+        with self._lock:
+            return json.loads(json.dumps(self._profile()))
+
+    def update(self, section=None, **values):
+        """Set top-level keys of the active profile, or keys of one of its sections"""
+        with self._lock:
+            target = self._profile()
+            if section:
+                target = target.setdefault(section, {})
+            target.update(json.loads(json.dumps(values)))
+            self._schedule()
+
+    def switch(self, name, save=True):
+        """Make ``name`` the active profile; a new profile starts as a copy of the current one"""
+        with self._lock:
+            data = self._load()
+            if name not in data['profiles']:
+                data['profiles'][name] = self.get()
+            data['active_profile'] = name
+            if save:
+                self._schedule()
+
+    def delete(self, name):
+        """Remove a profile other than the active one"""
+        with self._lock:
+            if name == self.active:
+                raise ValueError('the active profile cannot be deleted')
+            self._load()['profiles'].pop(name, None)
+            self._schedule()
+
+    def _schedule(self):
+        self._version += 1
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.delay, self.flush)
+        self._timer.start()
+
+    def flush(self):
+        """Write pending changes now; does nothing when the file is up to date"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            version = self._version
+            snapshot = json.loads(json.dumps(self._load()))
+        # Written outside the state lock so updates never wait on the disk
+        with self._write_lock:
+            if version <= self._saved_version:
+                return
+            write_json_atomic(self.path, snapshot)
+            self._saved_version = version
+
+
+config_store = ConfigStore()
+
+
+def save_config(txt_path, out_path, rules, insert_config=None):
+    config_store.update(txt_path=txt_path, out_path=out_path, rules=rules)
     if insert_config:
-        config['insert_config'] = insert_config
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+        config_store.update(insert_config=insert_config)
+
+def save_normalize_config(unicode_form, fold_punctuation, join_lines, quotes):
+    """Save insert text normalization configuration"""
+    config_store.update('normalize_config', unicode_form=unicode_form, fold_punctuation=fold_punctuation,
+                        join_lines=join_lines, quotes=quotes)
+
+def save_export_config(shard_by, shard_size, shard_target):
+    """Save export sharding configuration"""
+    config_store.update('export_config', shard_by=shard_by, shard_size=shard_size, shard_target=shard_target)
 
-def save_insert_config(insert_input_path, insert_output_path, max_chars, vir_chars, phy_chars, show_vir, show_phy):
+def save_mt_config(backend, location):
+    """Save the machine translation pre-fill backend; tuning keys edited by hand are kept"""
+    config_store.update('mt_config', backend=backend, location=location)
+
+def save_insert_config(insert_input_path, insert_output_path, max_chars, vir_chars, phy_chars, show_vir, show_phy,
+                       allocation='fill'):
     """Save insert tab configuration"""
-    # Load existing config first
-    existing_config = load_config() or {}
-    
-    insert_config = {
-        'insert_input_path': insert_input_path,
-        'insert_output_path': insert_output_path,
-        'max_chars': max_chars,
-        'vir_chars': vir_chars,
-        'phy_chars': phy_chars,
-        'show_vir': show_vir,
-        'show_phy': show_phy
-    }
-    
-    existing_config['insert_config'] = insert_config
-    
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(existing_config, f, ensure_ascii=False, indent=2)
+    config_store.update('insert_config', insert_input_path=insert_input_path,
+                        insert_output_path=insert_output_path, max_chars=max_chars, vir_chars=vir_chars,
+                        phy_chars=phy_chars, show_vir=show_vir, show_phy=show_phy, allocation=allocation)
 
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        return None
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Settings of the active profile, or None before anything was saved"""
+    return config_store.get() or None
 
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -309,6 +1651,573 @@ def get_resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+
+def find_alice_exe():
+    """Locate the bundled alice.exe, or return None"""
+    # Get alice.exe path (in alice-tool folder next to this script)
+    alice_exe = get_resource_path(os.path.join('alice-tool', 'alice.exe'))
+    if os.path.exists(alice_exe):
+        return alice_exe
+
+    # Fallback: try relative to script directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    alice_exe = os.path.join(script_dir, 'alice-tool', 'alice.exe')
+    if os.path.exists(alice_exe):
+        return alice_exe
+
+    # Native alice-tools build installed on PATH (Linux/macOS)
+    import shutil
+    return shutil.which('alice')
+
+
+def dump_ain_text(ain_path, txt_path):
+    """Dump the messages of an AIN file to a TXT in the format `ain edit -t` reads"""
+    import subprocess
+
+    alice_exe = find_alice_exe()
+    if alice_exe is None:
+        raise FileNotFoundError('alice.exe not found, cannot dump the AIN file')
+    result = subprocess.run([alice_exe, 'ain', 'dump', '-t', '-o', txt_path, ain_path],
+                            capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        raise RuntimeError(f'AIN dump failed:\n{result.stderr or result.stdout}')
+
+
+def backup_path_for(txt_path):
+    return txt_path.replace('.txt', '_backup.txt')
+
+
+PACK_CACHE_DIR = 'pack_cache'
+PACK_CACHE_ENTRIES = 8  # Packed AINs kept in the cache, oldest are dropped first
+PACK_WORKERS = 3
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def hash_files(paths, progress=None):
+    """sha256 over the contents of several files, reporting the fraction of bytes read"""
+    digest = hashlib.sha256()
+    total = sum(os.path.getsize(p) for p in paths) or 1
+    done = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done / total)
+        # Separator so moving bytes between the two files changes the hash
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def copy_atomic(src, dst):
+    import shutil
+
+    tmp_path = f'{dst}.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def stand_in_pack(ain_path, txt_path, output_path):
+    """Used when alice-tools is unavailable off Windows: copies the AIN unchanged so the rest of the workflow can run"""
+    copy_atomic(ain_path, output_path)
+
+
+class PackScheduler:
+    """Runs several `ain edit` packs concurrently and caches their outputs.
+
+    The cache is keyed by the sha256 of the input AIN and translated TXT, so
+    packing the same inputs again copies the cached AIN instead of running
+    alice-tools. Without alice-tools a pack fails on Windows, as before;
+    elsewhere the stand-in packer is used, its outputs are reported as such
+    and never cached.
+    """
+
+    def __init__(self, cache_dir=PACK_CACHE_DIR, workers=PACK_WORKERS, alice_exe=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.alice_exe = alice_exe or find_alice_exe()
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+
+    def _key_lock(self, key):
+        # Identical requests queued together wait for the first one, then hit the cache
+        with self._key_locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _prune_cache(self):
+        entries = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith('.ain')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[PACK_CACHE_ENTRIES:]:
+            os.remove(path)
+
+    def _run_alice(self, request, job, report):
+        import subprocess
+
+        cmd = [self.alice_exe, 'ain', 'edit', '-t', request['txt'], '-o', request['output'], request['ain']]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+        started = time.monotonic()
+        # Poll so a cancel can kill alice-tools
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                if job.cancelled:
+                    proc.kill()
+                    proc.communicate()
+                    raise JobCancelled(job.name)
+                report(f'packing {time.monotonic() - started:.0f}s', 0.5)
+        if proc.returncode != 0:
+            raise RuntimeError(stderr or stdout or f'alice exited with code {proc.returncode}')
+
+    def pack(self, request, job, report):
+        """Pack one {'ain', 'txt', 'output'} request; returns its status ('packed', 'cached' or 'stand-in')"""
+        job.check()
+        if not self.alice_exe:
+            if sys.platform == 'win32':
+                raise FileNotFoundError('alice.exe not found in the alice-tool folder')
+            report('stand-in copy', 0.5)
+            stand_in_pack(request['ain'], request['txt'], request['output'])
+            return 'stand-in'
+
+        key = hash_files([request['ain'], request['txt']], lambda f: report('hashing', f * 0.4))
+        cache_path = os.path.join(self.cache_dir, f'{key}.ain')
+        with self._key_lock(key):
+            job.check()
+            if os.path.exists(cache_path):
+                report('copying from cache', 0.9)
+                copy_atomic(cache_path, request['output'])
+                os.utime(cache_path)  # Keep recently used entries when pruning
+                return 'cached'
+
+            report('packing', 0.4)
+            self._run_alice(request, job, report)
+            report('caching', 0.95)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            copy_atomic(request['output'], cache_path)
+            self._prune_cache()
+            return 'packed'
+
+    def run(self, requests, job, report):
+        """Pack all requests concurrently; ``report(index, status, fraction)`` streams per-pack progress.
+
+        Returns a (status, message) pair per request. Raises JobCancelled
+        once every pack has stopped if the job was cancelled.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def pack_one(index):
+            request = requests[index]
+            try:
+                status = self.pack(request, job, lambda text, fraction: report(index, text, fraction))
+                result = (status, os.path.basename(request['output']))
+            except JobCancelled:
+                result = ('cancelled', '')
+            except Exception as exc:
+                result = ('failed', str(exc))
+            report(index, result[0], 1.0)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(requests)))) as executor:
+            results = list(executor.map(pack_one, range(len(requests))))
+        job.check()
+        return results
+
+
+MT_BACKENDS = ('none', 'identity', 'dictionary', 'libretranslate')
+MT_CACHE_FILE = 'mt_cache.sqlite'
+MT_BATCH_SIZE = 100  # Source texts per backend request
+MT_WORKERS = 4  # Concurrent backend requests
+MT_RATE = 0.0  # Backend requests per second over all workers; 0 = unlimited
+MT_TIMEOUT = 60
+
+
+class IdentityBackend:
+    """Offline stand-in that returns the source text; exercises the whole stage without a network"""
+
+    name = 'identity'
+
+    def translate(self, texts):
+        return list(texts)
+
+
+class DictionaryBackend:
+    """Offline exact-match lookup in a tab-separated ``source<TAB>target`` glossary; misses stay untranslated"""
+
+    def __init__(self, glossary_path):
+        self.table = {}
+        with open(glossary_path, encoding='utf-8-sig') as f:
+            for line in f:
+                source, sep, target = line.rstrip('\r\n').partition('\t')
+                if sep and source:
+                    self.table[source] = target
+        # Cached results are only reused with the same glossary content
+        self.name = f'dictionary:{hash_files([glossary_path])[:16]}'
+
+    def translate(self, texts):
+        return [self.table.get(text) for text in texts]
+
+
+class LibreTranslateBackend:
+    """Any LibreTranslate-compatible ``/translate`` endpoint; a batch is sent as one request"""
+
+    def __init__(self, url, source_lang='ja', target_lang='vi', api_key=''):
+        self.url = url.rstrip('/')
+        if not self.url.endswith('/translate'):
+            self.url += '/translate'
+        self.source_lang, self.target_lang, self.api_key = source_lang, target_lang, api_key
+        self.name = f'libretranslate:{self.url}:{source_lang}:{target_lang}'
+
+    def translate(self, texts):
+        import urllib.request
+
+        body = {'q': list(texts), 'source': self.source_lang, 'target': self.target_lang, 'format': 'text'}
+        if self.api_key:
+            body['api_key'] = self.api_key
+        request = urllib.request.Request(self.url, json.dumps(body).encode('utf-8'),
+                                         {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=MT_TIMEOUT) as response:
+            result = json.loads(response.read().decode('utf-8'))
+        translated = result.get('translatedText')
+        if not isinstance(translated, list) or len(translated) != len(texts):
+            raise ValueError(f'unexpected response from {self.url}: {str(result)[:200]}')
+        return translated
+
+
+def make_mt_backend(name, location='', source_lang='ja', target_lang='vi', api_key=''):
+    """Backend for a MT_BACKENDS name; ``location`` is the glossary file or the server URL"""
+    if name == 'identity':
+        return IdentityBackend()
+    if name == 'dictionary':
+        return DictionaryBackend(location)
+    if name == 'libretranslate':
+        if not location:
+            raise ValueError('libretranslate needs the server URL')
+        return LibreTranslateBackend(location, source_lang, target_lang, api_key)
+    raise ValueError(f'unknown MT backend: {name}')
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads; rate 0 disables it"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+MT_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    backend TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    translation TEXT NOT NULL,
+    PRIMARY KEY (backend, hash)
+) WITHOUT ROWID;
+"""
+
+
+def source_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def prefill_translations(rows, backend, cache_path=MT_CACHE_FILE, batch_size=MT_BATCH_SIZE, workers=MT_WORKERS,
+                         rate=MT_RATE, progress=None, check=None):
+    """Fill the empty Translate cells of (Range, Speaker, Dialogue, Translate) rows by machine translation.
+
+    Distinct Dialogue texts are looked up in the cache by sha256 first; the
+    rest go to the backend in batches on a thread pool, paced by a shared
+    rate limiter. Every finished batch is committed to the cache at once, so
+    a cancelled or failed run resumes where it stopped. ``check`` is called
+    between batches and may raise to cancel. Returns (rows, report).
+    """
+    import sqlite3
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    rows = [workbook_row(row) for row in rows]
+    targets = [i for i, row in enumerate(rows) if row[2] and not (row[3] and str(row[3]).strip())]
+    hashes = {}
+    for i in targets:
+        text = str(rows[i][2])
+        hashes.setdefault(text, source_hash(text))
+
+    conn = sqlite3.connect(cache_path)
+    try:
+        # One commit per batch; WAL keeps those cheap without risking the finished batches
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(MT_CACHE_SCHEMA)
+        results = dict(conn.execute('SELECT hash, translation FROM translations WHERE backend = ?',
+                                    (backend.name,)).fetchall()) if hashes else {}
+        pending = [text for text, digest in hashes.items() if digest not in results]
+        report = {'rows': len(targets), 'unique': len(hashes), 'cached': len(hashes) - len(pending),
+                  'translated': 0, 'missed': 0, 'batches': 0}
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), max(batch_size, 1))]
+        limiter = RateLimiter(rate)
+
+        def translate_batch(batch):
+            limiter.wait()
+            return batch, backend.translate(batch)
+
+        if batches:
+            executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches))))
+            try:
+                futures = [executor.submit(translate_batch, batch) for batch in batches]
+                for future in as_completed(futures):
+                    batch, translated = future.result()
+                    fresh = [(backend.name, hashes[text], target)
+                             for text, target in zip(batch, translated) if target]
+                    conn.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?, ?)', fresh)
+                    conn.commit()
+                    results.update((digest, target) for _, digest, target in fresh)
+                    report['translated'] += len(fresh)
+                    report['missed'] += len(batch) - len(fresh)
+                    report['batches'] += 1
+                    if progress:
+                        progress(report['batches'] / len(batches))
+                    if check:
+                        check()
+            finally:
+                # Batches not yet started are dropped on cancel or error; finished ones are already cached
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        conn.close()
+
+    filled = 0
+    for i in targets:
+        translation = results.get(hashes[str(rows[i][2])])
+        if translation:
+            rows[i][3] = translation
+            filled += 1
+    report['filled'] = filled
+    return rows, report
+
+
+def format_prefill_report(report):
+    return (f"Machine translation pre-fill: {report['filled']} of {report['rows']} empty rows filled\n"
+            f"{report['unique']} distinct texts: {report['cached']} from cache, {report['translated']} translated "
+            f"in {report['batches']} requests, {report['missed']} without a translation")
+
+
+def reverse_translation(parts, inverse_table):
+    """Rebuild a Translate cell from the m[] texts of one segment (None: line left commented)"""
+    if all(part is None for part in parts):
+        return ''
+    if not any(parts):
+        return 'null'
+    # Insert escapes after mapping, so unescape before de-mapping
+    return re_unescape.sub(r'\1', ''.join(part or '' for part in parts)).translate(inverse_table)
+
+
+def reverse_extract(txt_path, rules, vir_chars, phy_chars, original_path=None, q_msg=None, checkpoint=None):
+    """Rebuild (range, speaker, dialogue, translate) workbook rows from a translated TXT.
+
+    Segments come from the ``;m[]`` lines, grouped exactly as Convert does:
+    from ``original_path`` (e.g. the ``_backup.txt`` written by Insert) when
+    given, otherwise from the translated TXT itself, which then must still
+    hold its ``;m[]`` lines next to the ``m[]`` ones. Returns (rows, report).
+    """
+    decode_errors = DecodeErrors()
+    if original_path:
+        _, translations = scan_m_lines(txt_path, decode_errors)
+        segments = list(parse_stream(original_path, rules, q_msg, checkpoint=checkpoint, errors=decode_errors))
+    else:
+        translations = {}
+        # A translation line may follow the segment's last ;m[] line, so pair after the pass
+        segments = list(parse_stream(txt_path, rules, q_msg, checkpoint=checkpoint, translations=translations,
+                                     errors=decode_errors))
+
+    if len(vir_chars) == len(phy_chars):
+        inverse_table, shared = build_inverse_char_table(vir_chars, phy_chars)
+    else:
+        inverse_table, shared = {}, frozenset()
+
+    report = {'segments': len(segments), 'translated': 0, 'null': 0, 'partial': 0, 'shared': 0, 'orphans': 0}
+    rows, covered = [], set()
+    for rng, spk, txt in segments:
+        m_numbers = parse_range(rng)
+        covered.update(m_numbers)
+        parts = [translations.get(m_num) for m_num in m_numbers]
+        translate_text = reverse_translation(parts, inverse_table)
+        if translate_text == 'null':
+            report['null'] += 1
+        elif translate_text:
+            report['translated'] += 1
+            report['partial'] += None in parts
+            report['shared'] += any(part and not shared.isdisjoint(part) for part in parts)
+        rows.append((rng, spk, txt, translate_text))
+    report['orphans'] = len(translations.keys() - covered)
+    report['decode_errors'] = decode_errors.summary()
+    return rows, report
+
+
+def format_reverse_report(report):
+    lines = [f"Segments: {report['segments']}, translated: {report['translated']}, null: {report['null']}"]
+    if report['partial']:
+        lines.append(f"{report['partial']} segments have only some of their m[] lines translated.")
+    if report['shared']:
+        lines.append(f"{report['shared']} translations use a physical character shared by several virtual "
+                     "characters; check them.")
+    if report['orphans']:
+        lines.append(f"{report['orphans']} translated m[] lines have no original ;m[] line and were skipped. "
+                     "Choose the original TXT to recover them.")
+    if report['decode_errors']:
+        lines.append(f"{report['decode_errors']}, shown as U+FFFD.")
+    return '\n'.join(lines)
+
+
+def scan_m_lines(txt_path, errors=None):
+    """Map m[] numbers to their text, split into commented (;m[]) and uncommented (m[]) lines"""
+    commented, uncommented = {}, {}
+    with open(txt_path, 'rb') as fh:
+        data = fh.read()
+    for _, line in iter_txt_lines(data, (b';m[', b'm['), errors):
+        m = re_m_any.match(line)
+        if m:
+            (uncommented if not m.group(1) else commented)[int(m.group(2))] = m.group(3)
+    return commented, uncommented
+
+
+# Number of example entries kept per problem category in a verification report
+VERIFY_EXAMPLES = 20
+
+
+def verify_roundtrip(target_path, rows, rules, settings, source_path=None):
+    """Check that a modified TXT (or packed AIN) matches the workbook it was built from.
+
+    ``rows`` are the workbook rows and ``source_path`` the original TXT (e.g. the
+    insert backup), required for an AIN; without it a TXT's own commented lines stand in for the
+    original, and boundaries are only compared where every line is still
+    commented: segments around translated lines merge when re-extracted.
+    Everything is joined through dicts keyed by Range and m[] number:
+    - boundaries: re-extracted segments vs. workbook ranges and dialogue
+    - lost: m[] lines of a workbook range that are missing from the target
+    - content: translated m[] lines that differ from what insert would write
+    - outside: m[] lines written (uncommented, or changed in the AIN) outside any workbook range
+    """
+    if target_path.lower().endswith('.ain'):
+        import tempfile
+
+        # The AIN itself cannot be re-extracted, and without the original nothing counts as written
+        if not source_path:
+            raise ValueError('Verifying an AIN needs the original TXT (e.g. the _backup.txt)')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_path = os.path.join(tmp_dir, 'dump.txt')
+            dump_ain_text(target_path, dump_path)
+            final, _ = scan_m_lines(dump_path)
+        original = scan_m_lines(source_path)[0]
+        # Packed AINs keep every message, so "written" means changed from the original
+        written = {m for m, text in final.items() if m in original and original[m] != text}
+    else:
+        original, uncommented = scan_m_lines(target_path)
+        final = {**original, **uncommented}
+        if source_path:
+            original = scan_m_lines(source_path)[0]
+        written = set(uncommented)
+
+    problems = {'boundaries': [], 'lost': [], 'content': [], 'outside': [], 'invalid': []}
+    counts = dict.fromkeys(problems, 0)
+
+    def report(kind, entry):
+        counts[kind] += 1
+        if len(problems[kind]) < VERIFY_EXAMPLES:
+            problems[kind].append(entry)
+
+    workbook = {}
+    covered = set()
+    for row in rows:
+        if not row[0]:
+            continue
+        range_str = str(row[0])
+        workbook[range_str] = row
+        covered.update(parse_range(range_str))
+
+    # Hash join of re-extracted segments with workbook rows on Range
+    extracted = {rng: txt for rng, _, txt in parse_stream(source_path or target_path, rules, queue.Queue())}
+    unchecked = set()
+    if not source_path:
+        # Commented lines on both sides of an uncommented translation are re-extracted as one segment
+        for rng in [rng for rng in extracted if written.intersection(parse_range(rng))]:
+            unchecked.update(parse_range(rng))
+            del extracted[rng]
+        unchecked |= written
+    skipped = 0
+    for rng, txt in extracted.items():
+        row = workbook.get(rng)
+        if row is None:
+            report('boundaries', f'{rng}: extracted segment has no workbook row')
+        elif (row[2] or '') != txt:
+            report('boundaries', f'{rng}: dialogue differs from the workbook')
+    for rng, row in workbook.items():
+        if rng in extracted:
+            continue
+        if unchecked.intersection(parse_range(rng)):
+            skipped += 1
+            continue
+        report('boundaries', f'{rng}: workbook range is not an extracted segment')
+
+    for rng, row in workbook.items():
+        translate_text = str(row[3]).strip() if row[3] is not None else ''
+        m_numbers = parse_range(rng)
+        for m_num in m_numbers:
+            if m_num not in final:
+                report('lost', f'm[{m_num}] of {rng} is missing')
+        if not translate_text:
+            continue
+        try:
+            expected_pairs = transform_row(rng, translate_text, settings)
+        except InvalidRow as exc:
+            report('invalid', f'{rng}: {exc}')
+            continue
+        for m_num, expected in expected_pairs:
+            if m_num in final and final[m_num] != expected:
+                report('content', f'm[{m_num}] of {rng}: expected "{expected}", found "{final[m_num]}"')
+
+    for m_num in sorted(written - covered):
+        report('outside', f'm[{m_num}] = "{final[m_num]}" is outside every extracted range')
+
+    return {'segments': len(extracted), 'rows': len(workbook), 'unchecked': skipped, 'counts': counts,
+            'examples': problems}
+
+
+def format_verify_report(report):
+    titles = {
+        'boundaries': 'Segment boundary mismatches',
+        'lost': 'Lost m[] lines',
+        'content': 'Translated lines that differ from the workbook',
+        'outside': 'm[] lines written outside any extracted range',
+        'invalid': 'Rows rejected by normalization (not inserted)',
+    }
+    lines = [f"Extracted segments: {report['segments']}, workbook rows: {report['rows']}"]
+    if report['unchecked']:
+        lines.append(f"Boundaries not checked for {report['unchecked']} rows at or next to translated lines "
+                     f"(no original TXT such as the _backup.txt)")
+    if not any(report['counts'].values()):
+        if not report['segments'] and not report['rows']:
+            lines.append('Nothing to compare: no extracted segments and no workbook rows.')
+        elif report['unchecked']:
+            lines.append('No differences found in the lines that were checked.')
+        else:
+            lines.append('Round trip OK: no differences found.')
+    for kind, title in titles.items():
+        count = report['counts'][kind]
+        lines.append(f'{title}: {count}')
+        lines += [f'  {entry}' for entry in report['examples'][kind]]
+        if count > len(report['examples'][kind]):
+            lines.append(f"  … and {count - len(report['examples'][kind])} more")
+    return '\n'.join(lines)
+
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -317,13 +2226,14 @@ class App(tk.Tk):
         self.out_path = ''
         self.queue = queue.Queue()
         self.stats = {'total_lines': 0, 'dialogue_segments': 0}
+        self.jobs = {}  # Job name → Job, for cancellation
         
         self.setup_ui()
         self.load_saved_config()
         self.after(100, self.listen_queue)
 
     def setup_ui(self):
-        self.title(LANG[self.language]['title'])
+        self.title(f"{LANG[self.language]['title']} – {config_store.active}")
         self.geometry('700x650')  # Increased height to show Convert button
         self.resizable(False, False)
         
@@ -342,6 +2252,17 @@ class App(tk.Tk):
         lang_menu.add_command(label='Tiếng Việt', command=lambda: self.set_language('vi'))
         menubar.add_cascade(label=LANG[self.language]['lang_menu'], menu=lang_menu)
 
+        # Named settings profiles (per game build, per language); switching reloads every tab
+        profile_menu = tk.Menu(menubar, tearoff=0)
+        self.profile_var = tk.StringVar(value=config_store.active)
+        for name in config_store.profiles():
+            profile_menu.add_radiobutton(label=name, value=name, variable=self.profile_var,
+                                         command=lambda n=name: self.switch_profile(n))
+        profile_menu.add_separator()
+        profile_menu.add_command(label=LANG[self.language]['profile_new'], command=self.new_profile)
+        profile_menu.add_command(label=LANG[self.language]['profile_delete'], command=self.delete_profile)
+        menubar.add_cascade(label=LANG[self.language]['profile_menu'], menu=profile_menu)
+
         help_menu = tk.Menu(menubar, tearoff=0)
         help_menu.add_command(label=LANG[self.language]['help_title'], command=self.show_help)
         menubar.add_cascade(label=LANG[self.language]['help_menu'], menu=help_menu)
@@ -360,6 +2281,32 @@ class App(tk.Tk):
         self.setup_ui()
         self.load_saved_config()
 
+    def switch_profile(self, name):
+        if name != config_store.active:
+            config_store.switch(name)
+            self.refresh_ui()
+
+    def new_profile(self):
+        from tkinter import simpledialog
+
+        name = simpledialog.askstring(LANG[self.language]['profile_new'], LANG[self.language]['msg_profile_name'],
+                                      parent=self)
+        if name and name.strip():
+            self.switch_profile(name.strip())
+
+    def delete_profile(self):
+        current = config_store.active
+        others = [name for name in config_store.profiles() if name != current]
+        if not others:
+            messagebox.showwarning(LANG[self.language]['profile_menu'], LANG[self.language]['msg_profile_last'])
+            return
+        if not messagebox.askyesno(LANG[self.language]['profile_menu'],
+                                   f"{LANG[self.language]['msg_profile_delete']} \"{current}\"?"):
+            return
+        config_store.switch(DEFAULT_PROFILE if DEFAULT_PROFILE in others else others[0])
+        config_store.delete(current)
+        self.refresh_ui()
+
     def show_help(self):
         messagebox.showinfo(LANG[self.language]['help_title'], LANG[self.language]['help_text'])
 
@@ -376,9 +2323,17 @@ class App(tk.Tk):
         self.tab_alice = ttk.Frame(self.nb)
         self.nb.add(self.tab_alice, text="Alice tool")
 
+        self.tab_search = ttk.Frame(self.nb)
+        self.nb.add(self.tab_search, text="Search")
+
+        self.tab_progress = ttk.Frame(self.nb)
+        self.nb.add(self.tab_progress, text="Progress")
+
         self.create_file_processing_widgets()
         self.create_insert_widgets()
         self.create_alice_widgets()
+        self.create_search_widgets()
+        self.create_progress_widgets()
 
     def create_file_processing_widgets(self):
         # File selection section
@@ -395,6 +2350,48 @@ class App(tk.Tk):
         self.lbl_out = ttk.Label(file_frame, text='–', foreground='gray')
         self.lbl_out.grid(row=1, column=1, sticky='w', padx=(10, 0))
 
+        # Export sharding: one Dialogues sheet, or split per N segments / per speaker
+        shard_frame = ttk.Frame(file_frame)
+        shard_frame.grid(row=2, column=0, columnspan=2, sticky='w', padx=5)
+
+        ttk.Label(shard_frame, text=LANG[self.language]['lbl_shard_by']).pack(side='left')
+        self.shard_by_var = tk.StringVar(value='none')
+        shard_by = ttk.Combobox(shard_frame, textvariable=self.shard_by_var, values=SHARD_MODES,
+                                width=10, state='readonly')
+        shard_by.pack(side='left', padx=5)
+        shard_by.bind('<<ComboboxSelected>>', lambda e: self.save_export_config_now())
+
+        ttk.Label(shard_frame, text=LANG[self.language]['lbl_shard_size']).pack(side='left', padx=(10, 0))
+        self.shard_size_var = tk.IntVar(value=5000)
+        shard_size = ttk.Entry(shard_frame, textvariable=self.shard_size_var, width=8)
+        shard_size.pack(side='left', padx=5)
+        shard_size.bind('<FocusOut>', lambda e: self.save_export_config_now())
+
+        ttk.Label(shard_frame, text=LANG[self.language]['lbl_shard_target']).pack(side='left', padx=(10, 0))
+        self.shard_target_var = tk.StringVar(value='sheets')
+        shard_target = ttk.Combobox(shard_frame, textvariable=self.shard_target_var, values=SHARD_TARGETS,
+                                    width=10, state='readonly')
+        shard_target.pack(side='left', padx=5)
+        shard_target.bind('<<ComboboxSelected>>', lambda e: self.save_export_config_now())
+
+        # Optional machine translation of the empty Translate cells right after export
+        mt_frame = ttk.Frame(file_frame)
+        mt_frame.grid(row=3, column=0, columnspan=2, sticky='w', padx=5, pady=(6, 0))
+
+        ttk.Label(mt_frame, text=LANG[self.language]['lbl_mt_backend']).pack(side='left')
+        self.mt_backend_var = tk.StringVar(value='none')
+        mt_backend = ttk.Combobox(mt_frame, textvariable=self.mt_backend_var, values=MT_BACKENDS,
+                                  width=14, state='readonly')
+        mt_backend.pack(side='left', padx=5)
+        mt_backend.bind('<<ComboboxSelected>>', lambda e: self.save_mt_config_now())
+
+        ttk.Label(mt_frame, text=LANG[self.language]['lbl_mt_location']).pack(side='left', padx=(10, 0))
+        self.mt_location_var = tk.StringVar()
+        mt_location = ttk.Entry(mt_frame, textvariable=self.mt_location_var, width=36)
+        mt_location.pack(side='left', padx=5)
+        mt_location.bind('<FocusOut>', lambda e: self.save_mt_config_now())
+        ttk.Button(mt_frame, text='…', width=3, command=self.choose_mt_glossary).pack(side='left')
+
         # Rules section
         rules_frame = ttk.LabelFrame(self.tab_file, text=LANG[self.language]['lbl_rules'], padding=10)
         rules_frame.pack(fill='both', expand=True, padx=10, pady=5)
@@ -411,18 +2408,26 @@ class App(tk.Tk):
         self.entry_end = ttk.Entry(add_frame, width=12)
         self.entry_end.grid(row=0, column=3, padx=5)
         
-        ttk.Button(add_frame, text=LANG[self.language]['btn_add'], command=self.add_rule_inline)\
+        self.rule_regex = tk.BooleanVar()
+        ttk.Checkbutton(add_frame, text=LANG[self.language]['chk_regex'], variable=self.rule_regex)\
             .grid(row=0, column=4, padx=(10, 0))
 
+        ttk.Button(add_frame, text=LANG[self.language]['btn_add'], command=self.add_rule_inline)\
+            .grid(row=0, column=5, padx=(10, 0))
+
         # Rules tree
         tree_frame = ttk.Frame(rules_frame)
         tree_frame.pack(fill='both', expand=True)
 
-        self.tree = ttk.Treeview(tree_frame, columns=('start', 'end'), show='headings', height=8)
+        # 'extra' holds the JSON of regex/speaker/exclude options and stays hidden
+        self.tree = ttk.Treeview(tree_frame, columns=('start', 'end', 'options', 'extra'), show='headings', height=6,
+                                 displaycolumns=('start', 'end', 'options'))
         self.tree.heading('start', text=LANG[self.language]['col_start'])
         self.tree.heading('end', text=LANG[self.language]['col_end'])
+        self.tree.heading('options', text=LANG[self.language]['col_options'])
         self.tree.column('start', width=150, anchor='center')
         self.tree.column('end', width=150, anchor='center')
+        self.tree.column('options', width=200, anchor='center')
         
         scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
@@ -458,7 +2463,16 @@ class App(tk.Tk):
         
         convert_btn = ttk.Button(convert_frame, text=LANG[self.language]['btn_convert'], width=25, 
                   command=self.run_thread)
-        convert_btn.pack(pady=10)
+        convert_btn.pack(side='left', expand=True, anchor='e', padx=5, pady=10)
+
+        ttk.Button(convert_frame, text=LANG[self.language]['btn_cancel'], width=12,
+                   command=lambda: self.cancel_job('extract'))\
+            .pack(side='left', expand=True, anchor='w', padx=5, pady=10)
+
+        # Rebuild the workbook, Translate column included, from an already translated TXT
+        ttk.Button(convert_frame, text=LANG[self.language]['btn_reverse'], width=20,
+                   command=self.run_reverse_thread)\
+            .pack(side='left', anchor='w', padx=5, pady=10)
 
         ttk.Label(bottom_frame, text=LANG[self.language]['lbl_progress']).pack(anchor='w')
         self.pb = ttk.Progressbar(bottom_frame, orient='horizontal', length=500, mode='determinate')
@@ -467,6 +2481,12 @@ class App(tk.Tk):
         # Bind Enter key to add rule
         self.entry_end.bind('<Return>', lambda e: self.add_rule_inline())
 
+    def choose_mt_glossary(self):
+        path = filedialog.askopenfilename(filetypes=[('Glossary (source<TAB>target)', '*.tsv *.txt')])
+        if path:
+            self.mt_location_var.set(path)
+            self.save_mt_config_now()
+
     def choose_input(self):
         p = filedialog.askopenfilename(filetypes=[('TXT files', '*.txt')])
         if p:
@@ -483,14 +2503,30 @@ class App(tk.Tk):
             self.lbl_out.configure(text=filename, foreground='black')
 
     def update_file_stats(self):
-        if self.txt_path and os.path.exists(self.txt_path):
-            try:
-                with open(self.txt_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    total_lines = sum(1 for _ in f)
-                    self.stats['total_lines'] = total_lines
-                    self.lbl_total.configure(text=f"{LANG[self.language]['lbl_total_lines']} {total_lines}")
-            except:
-                pass
+        if not self.txt_path:
+            return
+
+        cached = cached_file_stats(self.txt_path)
+        if cached:
+            self.show_file_stats(self.txt_path, cached)
+            return
+
+        # Counting lines of a big dump (or one on a network drive) must not block the Tk main thread
+        self.lbl_total.configure(text=f"{LANG[self.language]['lbl_total_lines']} …")
+        threading.Thread(target=self.file_stats_worker, args=(self.txt_path,), daemon=True).start()
+
+    def file_stats_worker(self, path):
+        try:
+            self.queue.put(('file_stats', (path, compute_file_stats(path))))
+        except OSError:
+            pass
+
+    def show_file_stats(self, path, stats):
+        # Ignore results for a file that is no longer selected
+        if path != self.txt_path:
+            return
+        self.stats['total_lines'] = stats['total_lines']
+        self.lbl_total.configure(text=f"{LANG[self.language]['lbl_total_lines']} {stats['total_lines']}")
 
     def add_rule_inline(self):
         start = self.entry_start.get()
@@ -499,8 +2535,17 @@ class App(tk.Tk):
         if not end:
             messagebox.showwarning('Rule', LANG[self.language]['msg_end_required'])
             return
-        
-        self.tree.insert('', 'end', values=(start, end))
+
+        rule = {'start': start, 'end': end}
+        if self.rule_regex.get():
+            rule['regex'] = True
+            try:
+                RuleSet([rule])
+            except re.error as exc:
+                messagebox.showwarning('Rule', f"{LANG[self.language]['msg_bad_regex']} {exc}")
+                return
+
+        self.insert_rule(rule)
         self.entry_start.delete(0, 'end')
         self.entry_end.delete(0, 'end')
         self.entry_start.focus()
@@ -524,8 +2569,20 @@ class App(tk.Tk):
             self.tree.insert('', new_idx, values=vals)
             self.tree.selection_set(self.tree.get_children()[new_idx])
 
+    def insert_rule(self, rule):
+        extra = {k: rule[k] for k in RULE_OPTION_KEYS if rule.get(k)}
+        options = ', '.join(k if v is True else f'{k}={v}' for k, v in extra.items())
+        self.tree.insert('', 'end', values=(rule['start'], rule['end'], options,
+                                            json.dumps(extra, ensure_ascii=False)))
+
     def collect_rules(self):
-        return [{'start': s, 'end': e} for s, e in (self.tree.item(i, 'values') for i in self.tree.get_children())]
+        rules = []
+        for item in self.tree.get_children():
+            start, end, _, extra = self.tree.item(item, 'values')
+            rule = {'start': start, 'end': end}
+            rule.update(json.loads(extra) if extra else {})
+            rules.append(rule)
+        return rules
 
     def run_thread(self):
         if not self.txt_path or not self.out_path:
@@ -535,27 +2592,199 @@ class App(tk.Tk):
             messagebox.showwarning('Rules', LANG[self.language]['msg_no_rules'])
             return
 
+        rules = self.collect_rules()
+        try:
+            ruleset = RuleSet(rules)
+        except re.error as exc:
+            messagebox.showwarning('Rules', f"{LANG[self.language]['msg_bad_regex']} {exc}")
+            return
+
+        self.save_mt_config_now()
+        try:
+            mt_options = self.mt_prefill_options()
+        except (OSError, ValueError) as exc:
+            messagebox.showwarning(LANG[self.language]['lbl_mt_backend'], str(exc))
+            return
+        # Like --allow-identity on the command line, copying the source needs a deliberate yes
+        if mt_options and isinstance(mt_options['backend'], IdentityBackend) and not messagebox.askyesno(
+                LANG[self.language]['lbl_mt_backend'], LANG[self.language]['msg_mt_identity']):
+            return
+
+        job, resume = self.prepare_job('extract', f'{self.out_path}.checkpoint.json',
+                                       [file_signature(self.txt_path), rules])
+        if job is None:
+            return
+
         self.pb['value'] = 0
         self.stats['dialogue_segments'] = 0
+        save_config(self.txt_path, self.out_path, rules)
+        export_options = self.save_export_config_now()
+        self.toggle_widgets(disable=True)
+        self.launch_job(job, self.worker, ruleset, resume, export_options, mt_options)
+
+    def run_reverse_thread(self):
+        if not self.txt_path or not self.out_path:
+            messagebox.showwarning('Input', LANG[self.language]['msg_no_files'])
+            return
+        if not self.tree.get_children():
+            messagebox.showwarning('Rules', LANG[self.language]['msg_no_rules'])
+            return
+
         rules = self.collect_rules()
+        try:
+            ruleset = RuleSet(rules)
+        except re.error as exc:
+            messagebox.showwarning('Rules', f"{LANG[self.language]['msg_bad_regex']} {exc}")
+            return
+
+        # Insert keeps the untranslated file as _backup.txt; it restores segments whose ;m[] lines were replaced
+        original_path = backup_path_for(self.txt_path)
+        if original_path == self.txt_path or not os.path.exists(original_path):
+            original_path = None
+            if messagebox.askyesno(LANG[self.language]['btn_reverse'], LANG[self.language]['msg_reverse_original']):
+                original_path = filedialog.askopenfilename(filetypes=[('TXT files', '*.txt')]) or None
+
+        # Shares the extract job: both write the Excel output and Cancel stops either
+        job, _ = self.prepare_job('extract')
+        if job is None:
+            return
+
+        self.pb['value'] = 0
         save_config(self.txt_path, self.out_path, rules)
+        export_options = self.save_export_config_now()
         self.toggle_widgets(disable=True)
-        threading.Thread(target=self.worker, args=(rules,), daemon=True).start()
+        self.launch_job(job, self.reverse_worker, ruleset, original_path, export_options, self.insert_settings())
 
-    def worker(self, rules):
+    def reverse_worker(self, job, rules, original_path, export_options, settings):
         try:
-            wb = Workbook(write_only=True)
-            ws = wb.create_sheet('Dialogues')
-            ws.append(['Range', 'Speaker', 'Dialogue', 'Translate'])
-            
-            segment_count = 0
-            for rng, spk, txt in parse_stream(self.txt_path, rules, self.queue):
-                ws.append([rng, spk, txt, ''])
-                segment_count += 1
-                
-            wb.save(self.out_path)
+            rows, report = reverse_extract(self.txt_path, rules, settings[1], settings[2], original_path,
+                                           self.queue, checkpoint=lambda *_: job.check())
+            export_segments(self.out_path, rows, **export_options)
+            self.queue.put(('segments', len(rows)))
+
+            message = f"{LANG[self.language]['msg_finished']}\n\n{format_reverse_report(report)}"
+            try:
+                build_search_index(self.out_path, rows, settings)
+            except Exception as exc:
+                message += f'\n\nSearch index not built: {exc}'
+            self.queue.put(('done', message))
+        except JobCancelled:
+            self.queue.put(('cancelled', (job.name, 'Reverse extraction cancelled.')))
+        except Exception as exc:
+            self.queue.put(('error', str(exc)))
+
+    def save_export_config_now(self):
+        """Save and return current export sharding options"""
+        try:
+            shard_size = self.shard_size_var.get()
+        except tk.TclError:
+            shard_size = 5000
+        options = {
+            'shard_by': self.shard_by_var.get(),
+            'shard_size': shard_size,
+            'shard_target': self.shard_target_var.get()
+        }
+        save_export_config(**options)
+        return options
+
+    def save_mt_config_now(self):
+        save_mt_config(self.mt_backend_var.get(), self.mt_location_var.get().strip())
+
+    def mt_prefill_options(self):
+        """prefill_translations options for the saved backend, or None when it is off.
+
+        Opens the glossary or checks the URL, so it raises OSError or
+        ValueError for a backend that cannot run.
+        """
+        mt_config = (load_config() or {}).get('mt_config', {})
+        if mt_config.get('backend', 'none') == 'none':
+            return None
+        backend = make_mt_backend(mt_config['backend'], mt_config.get('location', ''),
+                                  mt_config.get('source_lang', 'ja'), mt_config.get('target_lang', 'vi'),
+                                  mt_config.get('api_key', ''))
+        return {'backend': backend, 'batch_size': mt_config.get('batch_size', MT_BATCH_SIZE),
+                'workers': mt_config.get('workers', MT_WORKERS), 'rate': mt_config.get('rate', MT_RATE)}
+
+    def prepare_job(self, name, checkpoint_path=None, key=None):
+        """Create a job, offering to resume from a checkpoint whose inputs still match"""
+        current = self.jobs.get(name)
+        if current and current.running:
+            messagebox.showwarning('Busy', 'This job is already running.')
+            return None, None
+
+        job = Job(name, checkpoint_path, key)
+        resume = job.load_checkpoint()
+        if resume is not None and not messagebox.askyesno(
+                'Resume', 'An interrupted run was found. Resume from its last checkpoint?'):
+            job.clear_checkpoint()
+            resume = None
+        self.jobs[name] = job
+        return job, resume
+
+    def launch_job(self, job, target, *args):
+        job.thread = threading.Thread(target=target, args=(job,) + args, daemon=True)
+        job.thread.start()
+
+    def cancel_job(self, name):
+        job = self.jobs.get(name)
+        if job and job.running:
+            job.cancel()
+
+    def worker(self, job, rules, resume, export_options, mt_options=None):
+        try:
+            # Segments are spooled to disk so a checkpoint can resume without re-parsing
+            spool_path = f'{self.out_path}.partial.jsonl'
+            if resume and not os.path.exists(spool_path):
+                resume = None
+            segment_count = resume['segments'] if resume else 0
+
+            with open(spool_path, 'r+b' if resume else 'wb') as spool:
+                if resume:
+                    # Drop segments written after the last checkpoint
+                    spool.truncate(resume['spool_size'])
+                    spool.seek(0, os.SEEK_END)
+
+                def checkpoint(offset, speakers):
+                    if job.checkpoint_due():
+                        spool.flush()
+                        job.save_checkpoint({'offset': offset, 'speakers': speakers,
+                                             'segments': segment_count, 'spool_size': spool.tell()})
+                        job.check()
+
+                decode_errors = DecodeErrors()
+                for segment in parse_stream(self.txt_path, rules, self.queue, resume, checkpoint,
+                                            errors=decode_errors):
+                    spool.write(json.dumps(segment, ensure_ascii=False).encode('utf-8') + b'\n')
+                    segment_count += 1
+
+            with open(spool_path, 'r', encoding='utf-8') as spool:
+                segments = [json.loads(line) for line in spool]
+
+            message = LANG[self.language]['msg_finished']
+            if mt_options:
+                # Cancelling here keeps the spool and checkpoint; translated batches are already cached
+                self.queue.put(('progress', 0))
+                segments, mt_report = prefill_translations(
+                    segments, progress=lambda fraction: self.queue.put(('progress', fraction)), check=job.check,
+                    **mt_options)
+                message += f'\n\n{format_prefill_report(mt_report)}'
+
+            export_segments(self.out_path, segments, **export_options)
+            os.remove(spool_path)
+            job.clear_checkpoint()
             self.queue.put(('segments', segment_count))
-            self.queue.put(('done', LANG[self.language]['msg_finished']))
+
+            if decode_errors.count:
+                # Shown as U+FFFD in the Dialogue column
+                message += f'\n\n{decode_errors.summary()}.'
+            try:
+                build_search_index(self.out_path, [workbook_row(segment) for segment in segments])
+            except Exception as exc:
+                # The workbook is already saved; a missing index only disables the Search tab
+                message += f'\n\nSearch index not built: {exc}'
+            self.queue.put(('done', message))
+        except JobCancelled:
+            self.queue.put(('cancelled', (job.name, 'Export cancelled. Run Convert again to resume.')))
         except Exception as exc:
             self.queue.put(('error', str(exc)))
 
@@ -565,6 +2794,8 @@ class App(tk.Tk):
                 msg, data = self.queue.get_nowait()
                 if msg == 'progress':
                     self.pb['value'] = data * 100
+                elif msg == 'file_stats':
+                    self.show_file_stats(*data)
                 elif msg == 'segments':
                     self.stats['dialogue_segments'] = data
                     self.lbl_segments.configure(text=f"{LANG[self.language]['lbl_dialogue_segments']} {data}")
@@ -579,15 +2810,35 @@ class App(tk.Tk):
                     self.pb_insert['value'] = data * 100
                 elif msg == 'insert_done':
                     self.pb_insert['value'] = 100
+                    self.refresh_progress()
                     messagebox.showinfo('Insert Finished', data)
                 elif msg == 'insert_error':
                     messagebox.showerror('Insert Error', data)
+                elif msg == 'glyph_report':
+                    self.show_glyph_report(data)
+                elif msg == 'verify_report':
+                    self.show_report_window('Round-trip verification', format_verify_report(data))
+                elif msg == 'cancelled':
+                    name, text = data
+                    if name == 'extract':
+                        self.toggle_widgets(disable=False)
+                    messagebox.showinfo('Cancelled', text)
+                elif msg == 'pack_progress':
+                    index, status, fraction = data
+                    if self.pack_tree.exists(str(index)):
+                        self.pack_tree.set(str(index), 'status',
+                                           status if fraction >= 1 else f'{status} {fraction:.0%}')
+                    self.pack_fractions[index] = fraction
+                    self.pb_alice['value'] = sum(self.pack_fractions) / len(self.pack_fractions) * 100
                 elif msg == 'alice_done':
-                    self.pb_alice.stop()
+                    self.pb_alice['value'] = 100
                     messagebox.showinfo('Alice Pack Finished', data)
                 elif msg == 'alice_error':
-                    self.pb_alice.stop()
                     messagebox.showerror('Alice Pack Error', data)
+                elif msg == 'search_index':
+                    self.lbl_search_status.configure(text=data)
+                    self.refresh_search_speakers()
+                    self.refresh_progress()
         except queue.Empty:
             pass
         self.after(100, self.listen_queue)
@@ -612,7 +2863,25 @@ class App(tk.Tk):
             self.lbl_out.configure(text=os.path.basename(self.out_path), foreground='black')
             
         for rule in cfg.get('rules', []):
-            self.tree.insert('', 'end', values=(rule['start'], rule['end']))
+            self.insert_rule(rule)
+
+        normalize_config = cfg.get('normalize_config', {})
+        if normalize_config and hasattr(self, 'unicode_form_var'):
+            self.unicode_form_var.set(normalize_config.get('unicode_form', NORMALIZE_DEFAULTS[0]))
+            self.fold_punct_var.set(normalize_config.get('fold_punctuation', NORMALIZE_DEFAULTS[1]))
+            self.join_lines_var.set(normalize_config.get('join_lines', NORMALIZE_DEFAULTS[2]))
+            self.quotes_var.set(normalize_config.get('quotes', NORMALIZE_DEFAULTS[3]))
+
+        export_config = cfg.get('export_config', {})
+        if export_config:
+            self.shard_by_var.set(export_config.get('shard_by', 'none'))
+            self.shard_size_var.set(export_config.get('shard_size', 5000))
+            self.shard_target_var.set(export_config.get('shard_target', 'sheets'))
+
+        mt_config = cfg.get('mt_config', {})
+        if mt_config:
+            self.mt_backend_var.set(mt_config.get('backend', 'none'))
+            self.mt_location_var.set(mt_config.get('location', ''))
         
         # Load insert config if exists
         insert_config = cfg.get('insert_config', {})
@@ -633,6 +2902,7 @@ class App(tk.Tk):
                 self.phy_chars_var.set(insert_config.get('phy_chars', self.phy_chars_var.get()))
                 self.show_vir.set(insert_config.get('show_vir', False))
                 self.show_phy.set(insert_config.get('show_phy', False))
+                self.allocation_var.set(insert_config.get('allocation', ALLOCATION_STRATEGIES[0]))
                 
                 # Update UI state based on loaded settings
                 self.toggle_vir_chars()
@@ -652,6 +2922,13 @@ class App(tk.Tk):
                 self.lbl_txt_file.configure(text=os.path.basename(self.txt_file_path), foreground='black')
             if self.output_ain_path and hasattr(self, 'lbl_output_ain'):
                 self.lbl_output_ain.configure(text=os.path.basename(self.output_ain_path), foreground='black')
+            self.pack_queue = alice_config.get('pack_queue', [])
+            if hasattr(self, 'pack_tree'):
+                self.refresh_pack_tree()
+
+        # Search the last exported workbook unless another one is chosen in the Search tab
+        if hasattr(self, 'lbl_search_workbook') and not self.search_workbook_path:
+            self.set_search_workbook(self.insert_input_path or self.out_path)
 
     def create_insert_widgets(self):
         # File selection section for Insert tab
@@ -710,15 +2987,60 @@ class App(tk.Tk):
         self.phy_entry.bind('<FocusOut>', lambda e: self.save_insert_config_now())
         self.phy_entry.bind('<KeyRelease>', lambda e: self.after(500, self.save_insert_config_now))  # Delay save while typing
 
+        # Text normalization applied to every translation before mapping and wrapping
+        ttk.Label(config_frame, text="Normalize:").grid(row=3, column=0, padx=(0, 5), sticky='w', pady=(10, 0))
+        norm_frame = ttk.Frame(config_frame)
+        norm_frame.grid(row=3, column=1, columnspan=2, sticky='ew', pady=(10, 0))
+
+        unicode_form, fold_punctuation, join_lines, quotes = NORMALIZE_DEFAULTS
+        self.unicode_form_var = tk.StringVar(value=unicode_form)
+        self.fold_punct_var = tk.BooleanVar(value=fold_punctuation)
+        self.join_lines_var = tk.BooleanVar(value=join_lines)
+        self.quotes_var = tk.StringVar(value=quotes)
+
+        unicode_box = ttk.Combobox(norm_frame, textvariable=self.unicode_form_var, values=UNICODE_FORMS,
+                                   width=6, state='readonly')
+        unicode_box.pack(side='left')
+        unicode_box.bind('<<ComboboxSelected>>', lambda e: self.save_normalize_config_now())
+        ttk.Checkbutton(norm_frame, text="Fold punctuation", variable=self.fold_punct_var,
+                        command=self.save_normalize_config_now).pack(side='left', padx=(10, 0))
+        ttk.Checkbutton(norm_frame, text="Join lines", variable=self.join_lines_var,
+                        command=self.save_normalize_config_now).pack(side='left', padx=(10, 0))
+        ttk.Label(norm_frame, text='Quotes " \\:').pack(side='left', padx=(10, 5))
+        quotes_box = ttk.Combobox(norm_frame, textvariable=self.quotes_var, values=QUOTE_POLICIES,
+                                  width=7, state='readonly')
+        quotes_box.pack(side='left')
+        quotes_box.bind('<<ComboboxSelected>>', lambda e: self.save_normalize_config_now())
+
+        # How a translation is spread over the m[] lines of a multi-line range
+        ttk.Label(config_frame, text="Allocation:").grid(row=4, column=0, padx=(0, 5), sticky='w', pady=(10, 0))
+        self.allocation_var = tk.StringVar(value=ALLOCATION_STRATEGIES[0])
+        allocation_box = ttk.Combobox(config_frame, textvariable=self.allocation_var, values=ALLOCATION_STRATEGIES,
+                                      width=10, state='readonly')
+        allocation_box.grid(row=4, column=1, sticky='w', pady=(10, 0))
+        allocation_box.bind('<<ComboboxSelected>>', lambda e: self.save_insert_config_now())
+
         config_frame.columnconfigure(1, weight=1)
 
         # Insert section
         insert_action_frame = ttk.Frame(self.tab_insert)
         insert_action_frame.pack(fill='x', padx=10, pady=20)
 
-        # Insert button
-        insert_btn = ttk.Button(insert_action_frame, text="Insert", width=25, command=self.run_insert)
-        insert_btn.pack(pady=10)
+        # Insert and analysis buttons
+        insert_btn_frame = ttk.Frame(insert_action_frame)
+        insert_btn_frame.pack(pady=10)
+
+        insert_btn = ttk.Button(insert_btn_frame, text="Insert", width=25, command=self.run_insert)
+        insert_btn.pack(side='left', padx=5)
+
+        ttk.Button(insert_btn_frame, text="Cancel", width=12, command=lambda: self.cancel_job('insert'))\
+            .pack(side='left', padx=5)
+
+        ttk.Button(insert_btn_frame, text="Analyze glyphs", width=18, command=self.run_glyph_analysis)\
+            .pack(side='left', padx=5)
+
+        ttk.Button(insert_btn_frame, text="Verify", width=10, command=self.run_verify)\
+            .pack(side='left', padx=5)
 
         # Progress for insert
         ttk.Label(insert_action_frame, text="Insert Progress:").pack(anchor='w')
@@ -775,149 +3097,204 @@ class App(tk.Tk):
                 self.vir_chars_var.get(),
                 self.phy_chars_var.get(),
                 self.show_vir.get(),
-                self.show_phy.get()
+                self.show_phy.get(),
+                self.allocation_var.get()
             )
 
+    def insert_settings(self):
+        """Picklable transform settings for transform_row, read on the Tk thread"""
+        norm = (self.unicode_form_var.get(), self.fold_punct_var.get(), self.join_lines_var.get(),
+                self.quotes_var.get())
+        return (self.max_chars_var.get(), self.vir_chars_var.get(), self.phy_chars_var.get(), norm,
+                self.allocation_var.get())
+
+    def save_normalize_config_now(self):
+        save_normalize_config(self.unicode_form_var.get(), self.fold_punct_var.get(),
+                              self.join_lines_var.get(), self.quotes_var.get())
+
     def run_insert(self):
         if not self.insert_input_path or not self.insert_output_path:
             messagebox.showwarning('Input', 'Please choose Excel input and TXT output files.')
             return
 
+        settings = self.insert_settings()
+        job, resume = self.prepare_job(
+            'insert', f'{self.insert_output_path}.checkpoint.json',
+            [file_signature(self.insert_input_path), file_signature(self.insert_output_path), list(settings)])
+        if job is None:
+            return
+
         self.pb_insert['value'] = 0
-        threading.Thread(target=self.insert_worker, daemon=True).start()
+        self.launch_job(job, self.insert_worker, settings, resume)
 
-    def insert_worker(self):
+    def insert_worker(self, job, settings, resume):
         try:
-            from openpyxl import load_workbook
             import shutil
-            
+
             # Create backup copy
-            backup_path = self.insert_output_path.replace('.txt', '_backup.txt')
+            backup_path = backup_path_for(self.insert_output_path)
             shutil.copy2(self.insert_output_path, backup_path)
-            
+
             # Load Excel data
-            wb = load_workbook(self.insert_input_path)
-            ws = wb.active
-            
-            translations = {}
-            for row in ws.iter_rows(min_row=2, values_only=True):  # Skip header
+            rows, sheet_warnings = [], []
+            sheet_rows = load_workbook_rows(self.insert_input_path, warnings=sheet_warnings)
+            for row in sheet_rows:
                 if row[0] and row[3] and str(row[3]).strip():  # Range, Translate columns, and Translate is not empty
-                    range_str = str(row[0])
-                    translate_text = str(row[3]).strip()
-                    
-                    # Skip if translate text is empty after stripping
-                    if not translate_text:
-                        continue
-                    
-                    # Check if translate text is "null" - treat as empty string
-                    if translate_text.lower() == "null":
-                        translate_text = ""
-                    
-                    # Parse range (e.g., "1069" or "1069-1072")
-                    if '-' in range_str:
-                        start_num = int(range_str.split('-')[0])
-                        end_num = int(range_str.split('-')[1])
-                        m_numbers = list(range(start_num, end_num + 1))
-                    else:
-                        m_numbers = [int(range_str)]
-                    
-                    # If translate_text is empty (was "null"), set all m_numbers to empty
-                    if not translate_text:
-                        for m_num in m_numbers:
-                            translations[m_num] = ""
-                    else:
-                        # Apply character replacement
-                        processed_text = self.apply_char_replacement(translate_text)
-                        
-                        # Split text based on max characters
-                        split_texts = self.split_text_by_chars(processed_text, self.max_chars_var.get())
-                        
-                        # Map to m[] numbers
-                        for i, m_num in enumerate(m_numbers):
-                            if i < len(split_texts):
-                                translations[m_num] = split_texts[i]
-                            else:
-                                # Set remaining m[] numbers to empty string
-                                translations[m_num] = ""
-            
-            # Read original file and replace
-            with open(self.insert_output_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            total_lines = len(lines)
-            processed_lines = 0
-            
-            for i, line in enumerate(lines):
-                m_match = re_m.match(line)
-                if m_match:
-                    m_num = int(m_match.group(1))
-                    if m_num in translations:
-                        # Replace the content without semicolon (uncomment)
-                        lines[i] = f'm[{m_num}] = "{translations[m_num]}"\n'
-                
-                processed_lines += 1
-                if processed_lines % 100 == 0:
-                    progress = processed_lines / total_lines
-                    self.queue.put(('insert_progress', progress))
-            
-            # Write back to file
-            with open(self.insert_output_path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-            
-            self.queue.put(('insert_done', f'Insert completed. Backup saved as: {os.path.basename(backup_path)}'))
+                    rows.append((str(row[0]), str(row[3]).strip()))
+
+            # Transformed rows are spooled per batch so a checkpoint can skip them on resume
+            spool_path = f'{self.insert_output_path}.insert.jsonl'
+            if resume and not os.path.exists(spool_path):
+                resume = None
+            rows_done = resume['rows_done'] if resume else 0
+            translations, invalid, allocations = {}, [], []
+
+            with open(spool_path, 'r+b' if resume else 'wb') as spool:
+                if resume:
+                    spool.truncate(resume['spool_size'])
+                    for line in spool:
+                        entry = json.loads(line)
+                        translations.update(entry['pairs'])
+                        invalid.extend(entry['invalid'])
+                        allocations.extend(entry['alloc'])
+                    spool.seek(0, os.SEEK_END)
+
+                # Normalize, map characters, wrap and allocate to m[] slots in worker processes
+                for batch, (results, errors, allocated) in iter_transform_batches(rows[rows_done:], settings):
+                    pairs = [pair for row_pairs in results for pair in row_pairs]
+                    translations.update(pairs)
+                    invalid.extend(errors)
+                    allocations.extend(allocated)
+                    entry = {'pairs': pairs, 'invalid': errors, 'alloc': allocated}
+                    spool.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+                    rows_done += len(batch)
+                    self.queue.put(('insert_progress', rows_done / max(len(rows), 1) * 0.5))
+
+                    if job.checkpoint_due():
+                        spool.flush()
+                        job.save_checkpoint({'rows_done': rows_done, 'spool_size': spool.tell()})
+                        job.check()
+
+                spool.flush()
+                job.save_checkpoint({'rows_done': rows_done, 'spool_size': spool.tell()})
+
+            # Splice the uncommented lines into the raw bytes; nothing else is decoded or rewritten
+            with open(self.insert_output_path, 'rb') as f:
+                data = f.read()
+
+            def splice_progress(fraction):
+                self.queue.put(('insert_progress', 0.5 + fraction * 0.5))
+                job.check()
+
+            chunks, _ = splice_translations(data, translations, splice_progress)
+            job.check()
+            # Only the lines the tool parses are checked, one at a time
+            decode_errors = DecodeErrors()
+            for _ in iter_txt_lines(data, errors=decode_errors):
+                pass
+
+            # Write back through a temp file so an interrupted write never truncates the TXT
+            tmp_path = f'{self.insert_output_path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.writelines(chunks)
+            os.replace(tmp_path, self.insert_output_path)
+
+            os.remove(spool_path)
+            job.clear_checkpoint()
+
+            message = f'Insert completed. Backup saved as: {os.path.basename(backup_path)}'
+            if sheet_warnings:
+                message += '\n' + '\n'.join(sheet_warnings)
+            if decode_errors.count:
+                message += f'\n{decode_errors.summary()}; they were kept unchanged.'
+            report_path = os.path.splitext(self.insert_output_path)[0] + '_invalid_rows.txt'
+            if invalid:
+                # Invalid rows keep their original line; list them all for the translators
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    f.writelines(f'{rng}\t{reason}\n' for rng, reason in invalid)
+                message += f'\n{len(invalid)} invalid rows were skipped, see: {os.path.basename(report_path)}'
+            elif os.path.exists(report_path):
+                # A report left by an earlier run would list rows that are now fine
+                os.remove(report_path)
+            if allocations:
+                # Per-row slot usage so ranges can be tuned in bulk (sort by Overflow chars in a spreadsheet)
+                report_path = os.path.splitext(self.insert_output_path)[0] + '_allocation.tsv'
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    f.writelines(format_allocation_report(allocations))
+                overflowing = sum(1 for record in allocations if record[4])
+                underfilled = sum(1 for record in allocations if record[2] < record[1])
+                message += (f'\nAllocation ({settings[4]}): {overflowing} rows overflow their m[] lines, '
+                            f'{underfilled} leave lines blank, see: {os.path.basename(report_path)}')
+            try:
+                refresh_search_index(self.insert_input_path, sheet_rows, settings)
+            except Exception as exc:
+                message += f'\nSearch index not updated: {exc}'
+            self.queue.put(('insert_done', message))
             
+        except JobCancelled:
+            self.queue.put(('cancelled', (job.name, 'Insert cancelled. Run Insert again to resume.')))
         except Exception as exc:
             self.queue.put(('insert_error', str(exc)))
 
-    def apply_char_replacement(self, text):
-        """Replace virtual characters with physical characters"""
-        vir_chars = self.vir_chars_var.get()
-        phy_chars = self.phy_chars_var.get()
-        
-        if len(vir_chars) != len(phy_chars):
-            return text
-        
-        result = text
-        for vir, phy in zip(vir_chars, phy_chars):
-            result = result.replace(vir, phy)
-        
-        return result
+    def run_glyph_analysis(self):
+        if not self.insert_input_path:
+            messagebox.showwarning('Input', 'Please choose the Excel file with translations.')
+            return
 
-    def split_text_by_chars(self, text, max_chars):
-        """Split text by max characters, avoiding breaking words"""
-        if len(text) <= max_chars:
-            return [text]
-        
-        result = []
-        current = ""
-        
-        i = 0
-        while i < len(text):
-            if len(current) + 1 <= max_chars:
-                current += text[i]
-                i += 1
-            else:
-                # Find last space or suitable break point
-                break_point = len(current)
-                for j in range(len(current) - 1, -1, -1):
-                    if current[j] in ' 　、。！？':  # Include Japanese punctuation
-                        break_point = j + 1
-                        break
-                
-                if break_point == 0:
-                    break_point = len(current)
-                
-                result.append(current[:break_point])
-                current = current[break_point:]
-                
-                if not current and i < len(text):
-                    current = text[i]
-                    i += 1
-        
-        if current:
-            result.append(current)
-        
-        return result
+        vir_chars, phy_chars = self.vir_chars_var.get(), self.phy_chars_var.get()
+        threading.Thread(target=self.glyph_analysis_worker, args=(vir_chars, phy_chars), daemon=True).start()
+
+    def glyph_analysis_worker(self, vir_chars, phy_chars):
+        try:
+            texts = [row[3] for row in load_workbook_rows(self.insert_input_path)]
+            self.queue.put(('glyph_report', analyze_glyph_coverage(texts, vir_chars, phy_chars)))
+        except Exception as exc:
+            self.queue.put(('insert_error', str(exc)))
+
+    def show_report_window(self, title, body):
+        win = tk.Toplevel(self)
+        win.title(title)
+        win.geometry('640x420')
+
+        text = tk.Text(win, wrap='char')
+        text.insert('1.0', body)
+        text.configure(state='disabled')
+        text.pack(fill='both', expand=True, padx=10, pady=(10, 5))
+        return win
+
+    def show_glyph_report(self, report):
+        win = self.show_report_window('Glyph coverage', format_glyph_report(report))
+
+        def apply_proposal():
+            self.vir_chars_var.set(report['proposal_vir'])
+            self.phy_chars_var.set(report['proposal_phy'])
+            self.save_insert_config_now()
+            win.destroy()
+
+        ttk.Button(win, text='Apply proposed mapping', command=apply_proposal).pack(pady=(0, 10))
+
+    def run_verify(self):
+        if not self.insert_input_path or not self.insert_output_path:
+            messagebox.showwarning('Input', 'Please choose Excel input and TXT output files.')
+            return
+
+        # A packed AIN from the Alice tab can be verified instead of the TXT
+        target_path = self.insert_output_path
+        backup_path = backup_path_for(self.insert_output_path)
+        source_path = backup_path if os.path.exists(backup_path) else None
+        if source_path and self.output_ain_path and os.path.exists(self.output_ain_path) and messagebox.askyesno(
+                'Verify', f'Verify the packed AIN ({os.path.basename(self.output_ain_path)}) instead of the TXT?'):
+            target_path = self.output_ain_path
+        settings = self.insert_settings()
+        threading.Thread(target=self.verify_worker,
+                         args=(target_path, source_path, self.collect_rules(), settings), daemon=True).start()
+
+    def verify_worker(self, target_path, source_path, rules, settings):
+        try:
+            rows = load_workbook_rows(self.insert_input_path)
+            self.queue.put(('verify_report', verify_roundtrip(target_path, rows, rules, settings, source_path)))
+        except Exception as exc:
+            self.queue.put(('insert_error', str(exc)))
 
     def create_alice_widgets(self):
         # File selection section for Alice tab
@@ -947,18 +3324,46 @@ class App(tk.Tk):
         alice_action_frame.pack(fill='x', padx=10, pady=20)
 
         # Pack button
-        pack_btn = ttk.Button(alice_action_frame, text="Pack Ain File", width=25, command=self.run_alice_pack)
-        pack_btn.pack(pady=10)
+        pack_btn_frame = ttk.Frame(alice_action_frame)
+        pack_btn_frame.pack(pady=10)
+
+        pack_btn = ttk.Button(pack_btn_frame, text="Pack Ain File", width=25, command=self.run_alice_pack)
+        pack_btn.pack(side='left', padx=5)
+
+        ttk.Button(pack_btn_frame, text="Cancel", width=12, command=lambda: self.cancel_job('pack'))\
+            .pack(side='left', padx=5)
+
+        # Pack queue: several Ain/TXT/Output variants packed concurrently
+        queue_btn_frame = ttk.Frame(alice_action_frame)
+        queue_btn_frame.pack(fill='x')
+        ttk.Label(queue_btn_frame, text="Pack queue:").pack(side='left')
+        ttk.Button(queue_btn_frame, text="Clear", width=10, command=self.clear_pack_queue)\
+            .pack(side='right', padx=(5, 0))
+        ttk.Button(queue_btn_frame, text="Remove", width=10, command=self.remove_pack_request)\
+            .pack(side='right', padx=(5, 0))
+        ttk.Button(queue_btn_frame, text="Add to queue", width=14, command=self.add_pack_request)\
+            .pack(side='right')
+
+        self.pack_tree = ttk.Treeview(alice_action_frame, columns=('ain', 'txt', 'output', 'status'),
+                                      show='headings', height=4)
+        for col, title, width in (('ain', 'Ain', 140), ('txt', 'TXT', 140), ('output', 'Output', 140),
+                                  ('status', 'Status', 160)):
+            self.pack_tree.heading(col, text=title)
+            self.pack_tree.column(col, width=width)
+        self.pack_tree.pack(fill='x', pady=(5, 10))
 
         # Progress for alice pack
         ttk.Label(alice_action_frame, text="Pack Progress:").pack(anchor='w')
-        self.pb_alice = ttk.Progressbar(alice_action_frame, orient='horizontal', length=500, mode='indeterminate')
+        self.pb_alice = ttk.Progressbar(alice_action_frame, orient='horizontal', length=500, mode='determinate')
         self.pb_alice.pack(pady=(5, 0))
 
         # Initialize paths
         self.ain_file_path = ''
         self.txt_file_path = ''
         self.output_ain_path = ''
+        self.pack_queue = []
+        self.pack_fractions = []
+        self.pack_scheduler = None
 
     def choose_ain_file(self):
         p = filedialog.askopenfilename(filetypes=[('AIN files', '*.ain')])
@@ -986,65 +3391,422 @@ class App(tk.Tk):
 
     def save_alice_config_now(self):
         """Save current alice configuration"""
-        # Load existing config first
-        existing_config = load_config() or {}
-        
-        alice_config = {
-            'ain_file_path': self.ain_file_path,
-            'txt_file_path': self.txt_file_path,
-            'output_ain_path': self.output_ain_path
-        }
-        
-        existing_config['alice_config'] = alice_config
-        
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(existing_config, f, ensure_ascii=False, indent=2)
-
-    def run_alice_pack(self):
+        config_store.update('alice_config', ain_file_path=self.ain_file_path, txt_file_path=self.txt_file_path,
+                            output_ain_path=self.output_ain_path, pack_queue=self.pack_queue)
+
+    def refresh_pack_tree(self, requests=None, statuses=None):
+        self.pack_tree.delete(*self.pack_tree.get_children())
+        for i, request in enumerate(requests if requests is not None else self.pack_queue):
+            status = statuses[i] if statuses else ''
+            self.pack_tree.insert('', 'end', iid=str(i), values=(
+                os.path.basename(request['ain']), os.path.basename(request['txt']),
+                os.path.basename(request['output']), status))
+
+    def add_pack_request(self):
         if not self.ain_file_path or not self.txt_file_path or not self.output_ain_path:
             messagebox.showwarning('Input', 'Please choose all required files: Ain file, TXT file, and Output path.')
             return
+        request = {'ain': self.ain_file_path, 'txt': self.txt_file_path, 'output': self.output_ain_path}
+        if any(r['output'] == request['output'] for r in self.pack_queue):
+            messagebox.showwarning('Pack queue', 'Another queued pack already writes this output path.')
+            return
+        self.pack_queue.append(request)
+        self.refresh_pack_tree()
+        self.save_alice_config_now()
+
+    def remove_pack_request(self):
+        selected = {int(iid) for iid in self.pack_tree.selection()}
+        self.pack_queue = [r for i, r in enumerate(self.pack_queue) if i not in selected]
+        self.refresh_pack_tree()
+        self.save_alice_config_now()
 
-        self.pb_alice.start()
-        threading.Thread(target=self.alice_pack_worker, daemon=True).start()
+    def clear_pack_queue(self):
+        self.pack_queue = []
+        self.refresh_pack_tree()
+        self.save_alice_config_now()
+
+    def run_alice_pack(self):
+        # The queue is packed as a whole; with an empty queue the selected files are packed
+        requests = list(self.pack_queue)
+        if not requests:
+            if not self.ain_file_path or not self.txt_file_path or not self.output_ain_path:
+                messagebox.showwarning('Input', 'Please choose all required files: Ain file, TXT file, and Output path.')
+                return
+            requests = [{'ain': self.ain_file_path, 'txt': self.txt_file_path, 'output': self.output_ain_path}]
+
+        job, _ = self.prepare_job('pack')
+        if job is None:
+            return
 
-    def alice_pack_worker(self):
+        # One scheduler for the session so identical requests share its cache locks
+        if self.pack_scheduler is None:
+            self.pack_scheduler = PackScheduler()
+        self.pack_fractions = [0.0] * len(requests)
+        self.refresh_pack_tree(requests, ['queued'] * len(requests))
+        self.pb_alice['value'] = 0
+        self.launch_job(job, self.alice_pack_worker, requests)
+
+    def alice_pack_worker(self, job, requests):
         try:
-            import subprocess
-            
-            # Get alice.exe path (in alice-tool folder next to this script)
-            alice_exe = get_resource_path(os.path.join('alice-tool', 'alice.exe'))
-            
-            if not os.path.exists(alice_exe):
-                # Fallback: try relative to script directory
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                alice_exe = os.path.join(script_dir, 'alice-tool', 'alice.exe')
-                
-                if not os.path.exists(alice_exe):
-                    self.queue.put(('alice_error', f'alice.exe not found at: {alice_exe}'))
-                    return
-            
-            # Build command: alice ain edit -t out.txt -o Tsumamigui3.ain Tsumamigui.ain
-            cmd = [
-                alice_exe,
-                'ain', 'edit',
-                '-t', self.txt_file_path,
-                '-o', self.output_ain_path,
-                self.ain_file_path
-            ]
-            
-            # Run command
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-            
-            if result.returncode == 0:
-                self.queue.put(('alice_done', f'Pack completed successfully!\nOutput: {os.path.basename(self.output_ain_path)}'))
+            def report(index, status, fraction):
+                self.queue.put(('pack_progress', (index, status, fraction)))
+
+            results = self.pack_scheduler.run(requests, job, report)
+
+            lines = [f'{os.path.basename(r["output"])}: {status}' + (f' ({message})' if status == 'failed' else '')
+                     for r, (status, message) in zip(requests, results)]
+            if any(status == 'stand-in' for status, _ in results):
+                # The output is an untranslated copy; never report it as a successful pack
+                lines.append('\nalice-tools was not found: the stand-in packer copied the Ain file '
+                             'unchanged, translations are NOT applied.')
+                self.queue.put(('alice_error', 'Pack incomplete:\n' + '\n'.join(lines)))
+            elif any(status == 'failed' for status, _ in results):
+                self.queue.put(('alice_error', 'Pack failed:\n' + '\n'.join(lines)))
             else:
-                error_msg = result.stderr if result.stderr else result.stdout
-                self.queue.put(('alice_error', f'Pack failed:\n{error_msg}'))
-                
+                self.queue.put(('alice_done', 'Pack completed successfully!\n' + '\n'.join(lines)))
+
+        except JobCancelled:
+            self.queue.put(('cancelled', (job.name, 'Pack cancelled.')))
         except Exception as exc:
             self.queue.put(('alice_error', str(exc)))
 
+    def create_search_widgets(self):
+        search_file_frame = ttk.LabelFrame(self.tab_search, text="Workbook", padding=10)
+        search_file_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Button(search_file_frame, text="Excel file…", width=12, command=self.choose_search_workbook)\
+            .pack(side='left', padx=5)
+        self.lbl_search_workbook = ttk.Label(search_file_frame, text='–', foreground='gray')
+        self.lbl_search_workbook.pack(side='left', padx=(10, 0))
+        ttk.Button(search_file_frame, text="Rebuild index", width=14, command=self.rebuild_search_index)\
+            .pack(side='right')
+
+        query_frame = ttk.LabelFrame(self.tab_search, text="Query", padding=10)
+        query_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Label(query_frame, text="Text:").grid(row=0, column=0, sticky='w')
+        self.search_text_var = tk.StringVar()
+        search_entry = ttk.Entry(query_frame, textvariable=self.search_text_var)
+        search_entry.grid(row=0, column=1, columnspan=3, sticky='ew', padx=5)
+        search_entry.bind('<Return>', lambda e: self.run_search())
+        ttk.Button(query_frame, text="Search", width=10, command=self.run_search).grid(row=0, column=4)
+
+        ttk.Label(query_frame, text="Speaker:").grid(row=1, column=0, sticky='w', pady=(6, 0))
+        self.search_speaker_var = tk.StringVar()
+        self.search_speaker_box = ttk.Combobox(query_frame, textvariable=self.search_speaker_var, width=18)
+        self.search_speaker_box.grid(row=1, column=1, sticky='w', padx=5, pady=(6, 0))
+        ttk.Label(query_frame, text="In:").grid(row=1, column=2, sticky='e', pady=(6, 0))
+        self.search_field_var = tk.StringVar(value='any')
+        ttk.Combobox(query_frame, textvariable=self.search_field_var, values=SEARCH_FIELDS, width=10,
+                     state='readonly').grid(row=1, column=3, sticky='w', padx=5, pady=(6, 0))
+        self.search_untranslated_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="Untranslated only", variable=self.search_untranslated_var)\
+            .grid(row=1, column=4, sticky='w', pady=(6, 0))
+        query_frame.columnconfigure(1, weight=1)
+
+        result_frame = ttk.Frame(self.tab_search)
+        result_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.search_tree = ttk.Treeview(result_frame, columns=WORKBOOK_HEADER, show='headings', height=14)
+        for col, width in zip(WORKBOOK_HEADER, (80, 90, 230, 230)):
+            self.search_tree.heading(col, text=col)
+            self.search_tree.column(col, width=width, stretch=col in ('Dialogue', 'Translate'))
+        scrollbar = ttk.Scrollbar(result_frame, orient='vertical', command=self.search_tree.yview)
+        self.search_tree.configure(yscrollcommand=scrollbar.set)
+        self.search_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+        self.lbl_search_status = ttk.Label(self.tab_search, text='', foreground='gray')
+        self.lbl_search_status.pack(anchor='w', padx=10, pady=(0, 5))
+
+        self.search_workbook_path = ''
+
+    def set_search_workbook(self, path):
+        self.search_workbook_path = path
+        if path:
+            self.lbl_search_workbook.configure(text=os.path.basename(path), foreground='black')
+            self.refresh_search_speakers()
+            self.refresh_progress()
+
+    def choose_search_workbook(self):
+        p = filedialog.askopenfilename(filetypes=[('Excel', '*.xlsx')])
+        if p:
+            self.set_search_workbook(p)
+
+    def refresh_search_speakers(self):
+        conn = open_search_index(self.search_workbook_path) if self.search_workbook_path else None
+        if conn is None:
+            self.search_speaker_box['values'] = []
+            self.lbl_search_status.configure(text='No search index for this workbook yet: click Rebuild index.')
+            return
+        try:
+            self.search_speaker_box['values'] = [''] + [spk for spk in search_speakers(conn) if spk]
+        finally:
+            conn.close()
+
+    def rebuild_search_index(self):
+        if not self.search_workbook_path:
+            messagebox.showwarning('Input', 'Please choose an Excel file.')
+            return
+        self.lbl_search_status.configure(text='Building search index…')
+        threading.Thread(target=self.search_index_worker, args=(self.search_workbook_path, self.insert_settings()),
+                         daemon=True).start()
+
+    def search_index_worker(self, xlsx_path, settings):
+        try:
+            rows = load_workbook_rows(xlsx_path)
+            build_search_index(xlsx_path, rows, settings)
+            self.queue.put(('search_index', f'Indexed {len(rows)} segments.'))
+        except Exception as exc:
+            self.queue.put(('search_index', f'Index build failed: {exc}'))
+
+    def run_search(self):
+        conn = open_search_index(self.search_workbook_path) if self.search_workbook_path else None
+        if conn is None:
+            self.lbl_search_status.configure(text='No search index for this workbook yet: click Rebuild index.')
+            return
+        try:
+            started = time.perf_counter()
+            results = search_segments(conn, self.search_text_var.get(), self.search_speaker_var.get(),
+                                      self.search_field_var.get(), self.search_untranslated_var.get())
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            conn.close()
+
+        self.search_tree.delete(*self.search_tree.get_children())
+        for row in results:
+            self.search_tree.insert('', 'end', values=row)
+        more = ' (limit reached)' if len(results) >= SEARCH_LIMIT else ''
+        self.lbl_search_status.configure(text=f'{len(results)} segments{more} in {elapsed:.2f} ms')
+
+    def create_progress_widgets(self):
+        # Translation progress of the Search tab's workbook, read from the statistics in its index
+        top_frame = ttk.Frame(self.tab_progress)
+        top_frame.pack(fill='x', padx=10, pady=(10, 5))
+        ttk.Label(top_frame, text="Group by:").pack(side='left')
+        self.progress_group_var = tk.StringVar(value='speaker')
+        group_box = ttk.Combobox(top_frame, textvariable=self.progress_group_var, values=STATS_GROUPS,
+                                 width=10, state='readonly')
+        group_box.pack(side='left', padx=5)
+        group_box.bind('<<ComboboxSelected>>', lambda e: self.refresh_progress())
+        ttk.Button(top_frame, text="Refresh", width=10, command=self.refresh_progress).pack(side='right')
+
+        self.lbl_progress_total = ttk.Label(self.tab_progress, text='', font=('Arial', 10, 'bold'))
+        self.lbl_progress_total.pack(anchor='w', padx=10)
+
+        table_frame = ttk.Frame(self.tab_progress)
+        table_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.progress_tree = ttk.Treeview(table_frame, columns=STATS_COLUMNS, show='headings', height=12)
+        for col in STATS_COLUMNS:
+            self.progress_tree.heading(col, text=col)
+            self.progress_tree.column(col, width=100 if col == 'Group' else 62, anchor='w' if col == 'Group' else 'e')
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=self.progress_tree.yview)
+        self.progress_tree.configure(yscrollcommand=scrollbar.set)
+        self.progress_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+        ttk.Label(self.tab_progress, text="Recent revisions:").pack(anchor='w', padx=10)
+        self.lbl_progress_revisions = ttk.Label(self.tab_progress, text='', foreground='gray', justify='left')
+        self.lbl_progress_revisions.pack(anchor='w', padx=10, pady=(0, 5))
+
+    def refresh_progress(self):
+        self.progress_tree.delete(*self.progress_tree.get_children())
+        conn = open_search_index(self.search_workbook_path) if self.search_workbook_path else None
+        if conn is None:
+            self.lbl_progress_total.configure(text='No index for this workbook yet: use Rebuild index in the Search tab.')
+            self.lbl_progress_revisions.configure(text='')
+            return
+        try:
+            group = self.progress_group_var.get()
+            rows, total = stats_summary(conn, group)
+            revisions = stats_revisions(conn)
+        finally:
+            conn.close()
+
+        for key, *values in rows:
+            label = region_label(key) if group == 'region' else (key or '(none)')
+            self.progress_tree.insert('', 'end', values=format_stats_row(label, values))
+        total_row = format_stats_row('Total', total)
+        self.lbl_progress_total.configure(
+            text=f'{os.path.basename(self.search_workbook_path)}: {total_row[5]} done, '
+                 f'{total_row[2]} translated, {total_row[3]} null, {total_row[4]} empty, '
+                 f'lines used {total_row[8]}, overflow {total_row[9]}')
+        self.lbl_progress_revisions.configure(text='\n'.join(
+            f'{time.strftime("%Y-%m-%d %H:%M", time.localtime(t))}: {changed} rows changed, '
+            f'{translated} translated, {nulls} null, {empty} empty'
+            for t, changed, translated, nulls, empty in revisions[:4]))
+
+
+def config_insert_settings(cfg):
+    """Insert settings tuple (see wrap_translation) saved by the Insert tab, or None before its first use"""
+    insert_config = cfg.get('insert_config')
+    if not insert_config:
+        return None
+    normalize_config = cfg.get('normalize_config', {})
+    norm = tuple(normalize_config.get(key, default) for key, default
+                 in zip(('unicode_form', 'fold_punctuation', 'join_lines', 'quotes'), NORMALIZE_DEFAULTS))
+    return (insert_config.get('max_chars', 50), insert_config.get('vir_chars', ''),
+            insert_config.get('phy_chars', ''), norm, insert_config.get('allocation', ALLOCATION_STRATEGIES[0]))
+
+
+def cli_search(args):
+    """`search` command: print matching segments as tab-separated lines"""
+    conn = None if args.rebuild else open_search_index(args.workbook)
+    if conn is None:
+        build_search_index(args.workbook, load_workbook_rows(args.workbook))
+        conn = open_search_index(args.workbook)
+    try:
+        started = time.perf_counter()
+        results = search_segments(conn, args.text, args.speaker, args.field, args.untranslated, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        conn.close()
+    for row in results:
+        print('\t'.join(row))
+    print(f'{len(results)} segments in {elapsed:.2f} ms', file=sys.stderr)
+    return 0
+
+
+def cli_stats(args):
+    """`stats` command: print the translation progress aggregates"""
+    conn = None if args.rebuild else open_search_index(args.workbook)
+    if conn is None:
+        build_search_index(args.workbook, load_workbook_rows(args.workbook))
+        conn = open_search_index(args.workbook)
+    try:
+        rows, total = stats_summary(conn, args.by)
+        revisions = stats_revisions(conn)
+    finally:
+        conn.close()
+    print('\t'.join(STATS_COLUMNS))
+    for key, *values in rows:
+        label = region_label(key) if args.by == 'region' else (key or '(none)')
+        print('\t'.join(map(str, format_stats_row(label, values))))
+    print('\t'.join(map(str, format_stats_row('Total', total))))
+    for t, changed, translated, nulls, empty in revisions:
+        print(f'{time.strftime("%Y-%m-%d %H:%M", time.localtime(t))}\t{changed} changed\t'
+              f'{translated} translated\t{nulls} null\t{empty} empty', file=sys.stderr)
+    return 0
+
+
+def cli_reverse(args):
+    """`reverse` command: rebuild a workbook from a translated TXT using the saved rules and mapping"""
+    cfg = load_config() or {}
+    if not cfg.get('rules'):
+        print(f'No delimiter rules in {CONFIG_FILE}; run the tool from the folder that holds it.', file=sys.stderr)
+        return 1
+    insert_config = cfg.get('insert_config', {})
+    original_path = args.original
+    if original_path is None and os.path.exists(backup_path_for(args.txt)) and backup_path_for(args.txt) != args.txt:
+        original_path = backup_path_for(args.txt)
+    rows, report = reverse_extract(args.txt, RuleSet(cfg.get('rules', [])), insert_config.get('vir_chars', ''),
+                                   insert_config.get('phy_chars', ''), original_path, queue.Queue())
+    export_segments(args.workbook, rows)
+    build_search_index(args.workbook, rows)
+    print(format_reverse_report(report))
+    return 0
+
+
+def cli_prefill(args):
+    """`prefill` command: machine-translate the empty Translate cells of a workbook in place"""
+    if args.backend == 'identity' and not args.allow_identity:
+        print('identity copies the Japanese source into Translate; pass --allow-identity to do that on purpose.',
+              file=sys.stderr)
+        return 1
+    cfg = load_config() or {}
+    mt_config = cfg.get('mt_config', {})
+    # The saved location belongs to the saved backend
+    location = args.location or (mt_config.get('location', '') if mt_config.get('backend') == args.backend else '')
+    try:
+        backend = make_mt_backend(args.backend, location, args.source or mt_config.get('source_lang', 'ja'),
+                                  args.target or mt_config.get('target_lang', 'vi'), mt_config.get('api_key', ''))
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    warnings = []
+    source_rows = load_workbook_rows(args.workbook, warnings=warnings)
+    for warning in warnings:
+        print(warning, file=sys.stderr)
+    rows, report = prefill_translations(
+        source_rows, backend, args.cache,
+        args.batch_size or mt_config.get('batch_size', MT_BATCH_SIZE),
+        args.workers or mt_config.get('workers', MT_WORKERS),
+        mt_config.get('rate', MT_RATE) if args.rate is None else args.rate)
+    filled = {str(row[0]): row[3] for row, source in zip(rows, source_rows)
+              if row[0] and row[3] != source[3]}
+    if filled:
+        write_translations(args.workbook, filled)
+        refresh_search_index(args.workbook, rows, config_insert_settings(cfg))
+    print(format_prefill_report(report))
+    print(f'{time.perf_counter() - started:.1f} s', file=sys.stderr)
+    return 0
+
+
+CLI_COMMANDS = ('search', 'stats', 'reverse', 'prefill')
+
+
+def main_cli(argv):
+    """Command-line entry point; the GUI starts when no command is given"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Tsumamigui3Tool', description='Tsumamigui 3 translation tool')
+    parser.add_argument('--profile', help=f'settings profile of {CONFIG_FILE} (default: the active one)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', help='search the segments of an extracted workbook')
+    search.add_argument('workbook', help='xlsx written by Convert (or its shard manifest)')
+    search.add_argument('text', nargs='?', default='', help='substring of Dialogue/Translate')
+    search.add_argument('--speaker', default='', help='exact speaker name')
+    search.add_argument('--field', choices=SEARCH_FIELDS, default='any')
+    search.add_argument('--untranslated', action='store_true', help='only rows with an empty Translate cell')
+    search.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    search.add_argument('--rebuild', action='store_true', help='rebuild the index from the workbook first')
+    search.set_defaults(handler=cli_search)
+
+    stats = commands.add_parser('stats', help='show translation progress of an extracted workbook')
+    stats.add_argument('workbook', help='xlsx written by Convert (or its shard manifest)')
+    stats.add_argument('--by', choices=STATS_GROUPS, default='speaker')
+    stats.add_argument('--rebuild', action='store_true', help='rebuild the index from the workbook first')
+    stats.set_defaults(handler=cli_stats)
+
+    reverse = commands.add_parser('reverse', help='rebuild a workbook from an already translated TXT')
+    reverse.add_argument('txt', help='translated TXT')
+    reverse.add_argument('workbook', help='xlsx to write')
+    reverse.add_argument('--original', help='untranslated TXT (default: the _backup.txt written by Insert)')
+    reverse.set_defaults(handler=cli_reverse)
+
+    prefill = commands.add_parser('prefill', help='machine-translate the empty Translate cells of a workbook')
+    prefill.add_argument('workbook', help='xlsx written by Convert (or its shard manifest)')
+    prefill.add_argument('--backend', choices=MT_BACKENDS[1:], required=True)
+    prefill.add_argument('--allow-identity', action='store_true',
+                         help='let the identity test backend copy the source text into Translate')
+    prefill.add_argument('--location', help='glossary file (dictionary) or server URL (libretranslate)')
+    prefill.add_argument('--source', help='source language for libretranslate (default ja)')
+    prefill.add_argument('--target', help='target language for libretranslate (default vi)')
+    prefill.add_argument('--batch-size', type=int, help=f'texts per request (default {MT_BATCH_SIZE})')
+    prefill.add_argument('--workers', type=int, help=f'concurrent requests (default {MT_WORKERS})')
+    prefill.add_argument('--rate', type=float, help='requests per second, 0 = unlimited')
+    prefill.add_argument('--cache', default=MT_CACHE_FILE, help='translation cache file')
+    prefill.set_defaults(handler=cli_prefill)
+
+    args = parser.parse_args(argv)
+    if args.profile:
+        if args.profile not in config_store.profiles():
+            parser.error(f'no profile {args.profile!r} in {CONFIG_FILE}; choose from {", ".join(config_store.profiles())}')
+        config_store.switch(args.profile, save=False)
+    # Windows consoles default to a legacy code page that cannot print Japanese; windowed builds have no stdout
+    if sys.stdout is not None and hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    return args.handler(args)
+
 
 if __name__ == '__main__':
+    import multiprocessing
+
+    # Needed by the insert process pool in PyInstaller builds
+    multiprocessing.freeze_support()
+    # Anything else on the command line (e.g. a file dropped on the exe) still opens the GUI
+    if len(sys.argv) > 1 and (sys.argv[1] in CLI_COMMANDS or sys.argv[1].startswith('-')):
+        sys.exit(main_cli(sys.argv[1:]))
     App().mainloop()
\ No newline at end of file